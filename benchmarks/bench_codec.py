@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCPP berichten/s door GrowattChargePoint per codec-modus.
+
+Stuurt een mix van MeterValues (3 fases) en Heartbeats door
+``route_message`` met een nep-websocket en een lege coordinator, en meet
+de doorvoer voor:
+
+    library        ocpp library zelf (json + altijd valideren)
+    full/json      onze codec, json, altijd valideren
+    full           onze codec, orjson (indien aanwezig), altijd valideren
+    sampled        MeterValues 1 op 10 gevalideerd, Heartbeat niet
+    off            geen validatie voor MeterValues en Heartbeat
+
+Gebruik (vanuit de root van de repo, met ocpp + websockets geïnstalleerd):
+
+    python benchmarks/bench_codec.py [aantal_berichten]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(ROOT, "custom_components", "growatt_thor")
+
+# De integratie-modules laden zonder het package __init__ (dat Home
+# Assistant importeert); codec en ocpp_server hebben HA niet nodig
+for name, path in (
+    ("custom_components", os.path.join(ROOT, "custom_components")),
+    ("custom_components.growatt_thor", PACKAGE_DIR),
+):
+    module = types.ModuleType(name)
+    module.__path__ = [path]
+    sys.modules.setdefault(name, module)
+
+from ocpp.v16 import ChargePoint as OcppChargePoint  # noqa: E402
+
+from custom_components.growatt_thor.codec import (  # noqa: E402
+    OcppCodec,
+    VALIDATE_OFF,
+    VALIDATE_SAMPLED,
+)
+from custom_components.growatt_thor.ocpp_server import (  # noqa: E402
+    GrowattChargePoint,
+)
+
+
+class _NullConnection:
+    async def send(self, message):
+        pass
+
+
+class _NullCoordinator:
+    def now(self):
+        return "2025-12-24T20:52:46Z"
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def _meter_values(i):
+    samples = []
+    for phase in ("L1", "L2", "L3"):
+        samples += [
+            {"value": "16.0", "measurand": "Current.Import", "phase": phase, "unit": "A"},
+            {"value": "230.1", "measurand": "Voltage", "phase": phase, "unit": "V"},
+            {"value": "3680", "measurand": "Power.Active.Import", "phase": phase, "unit": "W"},
+        ]
+    samples.append(
+        {"value": str(100000 + i), "measurand": "Energy.Active.Import.Register", "unit": "Wh"}
+    )
+    return json.dumps(
+        [
+            2,
+            str(i),
+            "MeterValues",
+            {
+                "connectorId": 1,
+                "transactionId": 1,
+                "meterValue": [
+                    {"timestamp": "2025-12-24T20:52:46Z", "sampledValue": samples}
+                ],
+            },
+        ]
+    )
+
+
+def _messages(count):
+    # 4 op 5 berichten MeterValues, de rest Heartbeat
+    return [
+        json.dumps([2, str(i), "Heartbeat", {}]) if i % 5 == 4 else _meter_values(i)
+        for i in range(count)
+    ]
+
+
+async def _run(messages, codec=None, library=False):
+    cp = GrowattChargePoint("BENCH", _NullConnection(), _NullCoordinator(), codec=codec)
+    route = (
+        (lambda raw: OcppChargePoint.route_message(cp, raw))
+        if library
+        else cp.route_message
+    )
+
+    start = time.perf_counter()
+    for raw in messages:
+        await route(raw)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    messages = _messages(count)
+
+    trusted = ("Heartbeat", "MeterValues")
+    modes = [
+        ("library", dict(library=True)),
+        ("full/json", dict(codec=OcppCodec(use_orjson=False))),
+        ("full", dict(codec=OcppCodec())),
+        (
+            "sampled",
+            dict(codec=OcppCodec({"Heartbeat": VALIDATE_OFF, "MeterValues": VALIDATE_SAMPLED})),
+        ),
+        ("off", dict(codec=OcppCodec({action: VALIDATE_OFF for action in trusted}))),
+    ]
+
+    # ocpp logt ieder bericht op INFO; dat meten we hier niet
+    logging.disable(logging.CRITICAL)
+
+    print(f"{count} messages, JSON backend: {OcppCodec().backend}")
+    for name, kwargs in modes:
+        rate = asyncio.run(_run(messages, **kwargs))
+        print(f"{name:<10} {rate:>10.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-import logging
+from __future__ import annotations
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall
+import asyncio
+import importlib
+import logging
 
 from .const import (
     DOMAIN,
@@ -9,40 +10,175 @@ from .const import (
     DEFAULT_PORT,
     CONF_HOST,
     CONF_PORT,
+    CONF_EVENT_STREAM,
+    CONF_CHARGE_POINT_ID,
+    DEFAULT_EVENT_PORT,
+    TRANSPORT_CLOSE_DELAY,
+    CONF_METRICS_PORT,
+    DEFAULT_METRICS_PORT,
+    METRICS_REFRESH_INTERVAL,
+    CONF_PRICE_ENTITY,
+    CONF_VALIDATION_POLICY,
+    DEFAULT_VALIDATION_POLICY,
+    DEFAULT_VALIDATION_SAMPLE_RATE,
 )
-from .coordinator import GrowattCoordinator
-from .ocpp_server import start_ocpp_server
+
+try:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.exceptions import ConfigEntryNotReady, ServiceValidationError
+    from homeassistant.core import (
+        HomeAssistant,
+        ServiceCall,
+        ServiceResponse,
+        SupportsResponse,
+        callback,
+    )
+    from homeassistant.helpers import config_validation as cv
+    from homeassistant.helpers.event import async_call_later, async_track_time_change
+    import voluptuous as vol
+except ModuleNotFoundError as exc:
+    # De standalone gateway (gateway.py) importeert dit package zonder Home
+    # Assistant. Hij gebruikt alleen de OCPP modules, niet de setup hieronder.
+    if exc.name != "homeassistant":
+        raise
+else:
+    from .command_queue import CommandQueue, KIND_CHANGE_CONFIGURATION, KIND_REFRESH
+    from .coordinator import GrowattCoordinator
+    from .cost import CostEngine
+    from .event_stream import follow_event_stream, parse_address
+    from .metrics import MetricsExporter
+    from .startup import StartupTimer
+
+    SET_CONFIGURATION_SCHEMA = vol.Schema(
+        {
+            vol.Required("key"): cv.string,
+            vol.Required("value"): cv.string,
+        }
+    )
+
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS: list[str] = ["sensor"]
+PLATFORMS: list[str] = ["binary_sensor", "sensor"]
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Growatt THOR from a config entry (push-based OCPP)."""
 
-    coordinator = GrowattCoordinator(hass)
+    timer = StartupTimer()
 
-    host = entry.data.get(CONF_HOST, DEFAULT_HOST)
-    port = entry.data.get(CONF_PORT, DEFAULT_PORT)
+    data = hass.data.setdefault(DOMAIN, {})
+    settings = {**entry.data, **entry.options}
 
-    # Start OCPP server (BELANGRIJK: hass meegeven)
-    server = await start_ocpp_server(
-        host=host,
-        port=port,
-        coordinator=coordinator,
-        hass=hass,
+    host = settings.get(CONF_HOST, DEFAULT_HOST)
+    port = settings.get(CONF_PORT, DEFAULT_PORT)
+    event_stream = settings.get(CONF_EVENT_STREAM)
+    charge_point_id = settings.get(CONF_CHARGE_POINT_ID) or None
+
+    # Reload: de verbindingen van de vorige setup leven nog (zie
+    # async_unload_entry), dus het geplande sluiten afblazen
+    cancel_close = data.pop("cancel_close", None)
+    if cancel_close:
+        cancel_close()
+
+    # Coordinator hergebruiken zodat de entities direct weer data hebben
+    coordinator = data.get("coordinator") or GrowattCoordinator(hass)
+    data["coordinator"] = coordinator
+
+    transport_key = (
+        (CONF_EVENT_STREAM, event_stream, charge_point_id)
+        if event_stream
+        else (host, port)
     )
 
-    hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN]["server"] = server
-    hass.data[DOMAIN]["coordinator"] = coordinator
+    transport_started = data.get("transport_key") != transport_key
+
+    if not transport_started:
+        _LOGGER.info("Growatt THOR reusing existing OCPP connections")
+
+        # Validatiebeleid kan zonder herstart van de server wijzigen; schema's
+        # van actions die nu wel gevalideerd worden vooraf laden (disk I/O)
+        codec = data.get("codec")
+        if codec is not None:
+            codec.set_policy(_validation_policy(settings))
+            await hass.async_add_executor_job(_warm_up_codec, codec)
+    else:
+        await _async_stop_transport(hass)
+
+        # Bind hier en niet op de achtergrond: een bezette poort moet de
+        # setup laten mislukken (ConfigEntryNotReady, HA probeert opnieuw)
+        await _async_start_transport(hass, settings, coordinator, timer)
+        data["transport_key"] = transport_key
+
+    # Metrics endpoint los van de OCPP server: een andere metrics poort
+    # hoeft de THOR verbindingen niet te raken
+    metrics_port = settings.get(CONF_METRICS_PORT, DEFAULT_METRICS_PORT)
+    metrics_key = (host, metrics_port) if metrics_port else None
+
+    if data.get("metrics_key") != metrics_key:
+        await _async_stop_metrics(hass)
+        if metrics_key:
+            await _async_start_metrics(hass, host, metrics_port)
+
+    data["startup"] = timer
+
+    # Een live THOR aan de coordinator (her)koppelen
+    cp = data.get("charge_point")
+    if cp is not None:
+        cp.coordinator = coordinator
+
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
     # ─────────────────────────────
-    # Manual refresh service
+    # Commando's (refresh, set_configuration)
     # ─────────────────────────────
 
-    async def handle_refresh(call: ServiceCall) -> None:
+    # De wachtrij overleeft reloads; bij de eerste setup van disk laden
+    if "commands" not in data:
+        commands = CommandQueue(hass)
+        await commands.async_load()
+        data["commands"] = commands
+
+    async def _async_submit(kind, key=None, value=None) -> dict:
+        """
+        Commando in de wachtrij zetten en direct versturen als de THOR
+        verbonden is. Anders gaat het mee na de volgende BootNotification.
+        """
+        domain_data = hass.data[DOMAIN]
+        commands = domain_data["commands"]
+        cp = domain_data.get("charge_point")
+
+        # De gateway heeft de verbinding: vanuit hier komt het nooit aan,
+        # dus ook niet als "queued" terugmelden
+        if domain_data.get("event_stream"):
+            raise ServiceValidationError(
+                f"Growatt THOR {kind} is not available when following a "
+                "gateway event stream"
+            )
+
+        if cp is not None:
+            cp_id = cp.id
+        else:
+            coordinator = domain_data.get("coordinator")
+            cp_id = coordinator.charge_point_id if coordinator else None
+
+        command = commands.enqueue(cp_id, kind, key, value)
+
+        if cp is not None:
+            await commands.async_flush(cp)
+        else:
+            _LOGGER.info(
+                "Growatt THOR not connected, %s queued until next BootNotification",
+                kind,
+            )
+
+        return {
+            "command_id": command["id"],
+            "status": command["status"],
+            "result": command["result"],
+        }
+
+    async def handle_refresh(call: ServiceCall) -> ServiceResponse:
         """
         Manually trigger OCPP + Growatt specific updates.
         Exact volgorde zoals Growatt cloud:
@@ -50,83 +186,287 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         2. External meter values
         3. Configuration
         """
-        cp = hass.data.get(DOMAIN, {}).get("charge_point")
-
-        if not cp:
-            _LOGGER.warning(
-                "Growatt THOR refresh requested, but no charge point connected yet"
-            )
-            return
-
         _LOGGER.info("Manual Growatt THOR refresh triggered from Home Assistant")
+        return await _async_submit(KIND_REFRESH)
 
-        try:
-            # 1️⃣ StatusNotification
-            if hasattr(cp, "trigger_status"):
-                _LOGGER.debug("Triggering StatusNotification")
-                await cp.trigger_status()
-            else:
-                _LOGGER.warning("ChargePoint has no trigger_status() method")
-
-            # 2️⃣ Live Growatt meter values
-            if hasattr(cp, "trigger_external_meterval"):
-                _LOGGER.debug("Triggering Growatt external meter values")
-                await cp.trigger_external_meterval()
-            else:
-                _LOGGER.warning(
-                    "ChargePoint has no trigger_external_meterval() method"
-                )
-
-            # 3️⃣ 🔧 Growatt configuration (load balancing, limits, etc)
-            if hasattr(cp, "trigger_get_configuration"):
-                _LOGGER.debug("Triggering Growatt GetConfiguration")
-                await cp.trigger_get_configuration()
-            else:
-                _LOGGER.warning(
-                    "ChargePoint has no trigger_get_configuration() method"
-                )
-
-        except Exception:
-            _LOGGER.exception("Failed to trigger Growatt THOR refresh")
+    async def handle_set_configuration(call: ServiceCall) -> ServiceResponse:
+        """ChangeConfiguration; bij een offline THOR wint de laatste waarde per key."""
+        return await _async_submit(
+            KIND_CHANGE_CONFIGURATION,
+            call.data["key"],
+            call.data["value"],
+        )
 
     if not hass.services.has_service(DOMAIN, "refresh"):
         hass.services.async_register(
             DOMAIN,
             "refresh",
             handle_refresh,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+    if not hass.services.has_service(DOMAIN, "set_configuration"):
+        hass.services.async_register(
+            DOMAIN,
+            "set_configuration",
+            handle_set_configuration,
+            schema=SET_CONFIGURATION_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+    # ─────────────────────────────
+    # Kosten (alleen met prijs-entity)
+    # ─────────────────────────────
+
+    # Net als de wachtrij: totalen overleven reloads, eerste keer van disk
+    if "cost" not in data:
+        cost = CostEngine(hass, None)
+        await cost.async_load()
+        data["cost"] = cost
+
+    cost = data["cost"]
+    cost.price_entity = settings.get(CONF_PRICE_ENTITY) or None
+    coordinator.cost = cost if cost.price_entity else None
+
+    if coordinator.cost is not None:
+        @callback
+        def _async_midnight(_now) -> None:
+            if cost.roll_day():
+                coordinator.async_update_listeners()
+
+        entry.async_on_unload(
+            async_track_time_change(hass, _async_midnight, hour=0, minute=0, second=0)
         )
 
     # ─────────────────────────────
-    # Load platforms (sensor.py)
+    # Load platforms (sensor.py, binary_sensor.py)
     # ─────────────────────────────
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    with timer.span("platforms"):
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # ─────────────────────────────
+    # Eerste THOR klaar (status ontvangen)
+    # ─────────────────────────────
+
+    # Alleen als de transport echt gestart is: na een reload die de
+    # verbindingen hergebruikt is er geen opstart om te rapporteren
+    @callback
+    def _async_first_charger_ready() -> None:
+        if "first_charger_ready" in timer.marks:
+            return
+        if coordinator.status in (None, "Unavailable"):
+            return
+        timer.mark("first_charger_ready")
+        timer.log("startup")
+
+    if transport_started:
+        entry.async_on_unload(
+            coordinator.async_add_listener(_async_first_charger_ready)
+        )
+        _async_first_charger_ready()
+
+    return True
+
+
+async def _async_start_transport(hass, settings, coordinator, timer) -> None:
+    """Start de OCPP server, of volg de event stream van een gateway."""
+
+    data = hass.data[DOMAIN]
+    event_stream = settings.get(CONF_EVENT_STREAM)
+
+    if event_stream:
+        # Externe gateway (gateway.py) draait de OCPP server; wij volgen
+        # alleen de event stream en hebben de ocpp library niet nodig
+        try:
+            stream_host, stream_port = parse_address(event_stream, DEFAULT_EVENT_PORT)
+        except ValueError as exc:
+            # Oude entry van voor de validatie in de config flow
+            raise ConfigEntryNotReady(
+                f"Invalid event stream address {event_stream!r}: {exc}"
+            ) from exc
+
+        data["event_stream"] = hass.async_create_background_task(
+            follow_event_stream(
+                stream_host,
+                stream_port,
+                coordinator,
+                settings.get(CONF_CHARGE_POINT_ID) or None,
+            ),
+            "growatt_thor_event_stream",
+        )
+        _LOGGER.info("Growatt THOR following gateway event stream %s", event_stream)
+        return
+
+    host = settings.get(CONF_HOST, DEFAULT_HOST)
+    port = settings.get(CONF_PORT, DEFAULT_PORT)
+
+    # websockets + ocpp.v16 zijn zwaar om te importeren: in de executor,
+    # zodat de event loop niet blokkeert
+    with timer.span("import"):
+        ocpp_server = await hass.async_add_executor_job(
+            importlib.import_module, f"{__name__}.ocpp_server"
+        )
+
+    codec = ocpp_server.OcppCodec(
+        _validation_policy(settings), sample_rate=DEFAULT_VALIDATION_SAMPLE_RATE
+    )
+
+    with timer.span("warm_up"):
+        await hass.async_add_executor_job(_warm_up_codec, codec)
+
+    try:
+        with timer.span("bind"):
+            # Start OCPP server (BELANGRIJK: hass meegeven)
+            data["manager"] = await ocpp_server.start_ocpp_server(
+                host=host,
+                port=port,
+                coordinator=coordinator,
+                hass=hass,
+                codec=codec,
+                warm_up=False,
+            )
+    except OSError as exc:
+        raise ConfigEntryNotReady(
+            f"Growatt THOR OCPP server could not listen on {host}:{port}: {exc}"
+        ) from exc
+
+    data["codec"] = codec
+    _LOGGER.info("Growatt THOR OCPP server started on %s:%s", host, port)
+    timer.log("transport ready")
+
+
+def _warm_up_codec(codec) -> None:
+    """Validators vooraf laden; leest de schema's van disk, dus executor."""
+    ocpp_server = importlib.import_module(f"{__name__}.ocpp_server")
+    codec.warm_up(ocpp_server.supported_actions())
+
+
+def _validation_policy(settings) -> dict:
+    """
+    Validatiebeleid uit de opties. Alleen aanroepen als de ocpp modules al
+    (in de executor) geïmporteerd zijn.
+    """
+    value = settings.get(CONF_VALIDATION_POLICY)
+    if value is None:
+        return dict(DEFAULT_VALIDATION_POLICY)
+
+    codec = importlib.import_module(f"{__name__}.codec")
+    try:
+        return codec.parse_policy(value)
+    except ValueError as exc:
+        _LOGGER.error("Growatt THOR validation policy ignored: %s", exc)
+        return dict(DEFAULT_VALIDATION_POLICY)
+
+
+async def _async_start_metrics(hass, host, port) -> None:
+    """Start de Prometheus endpoint; leest alleen de snapshot bij een scrape."""
 
-    _LOGGER.info(
-        "Growatt THOR OCPP server started on %s:%s",
+    def _coordinators():
+        coordinator = hass.data.get(DOMAIN, {}).get("coordinator")
+        return [coordinator] if coordinator is not None else []
+
+    exporter = MetricsExporter(
         host,
         port,
+        _coordinators,
+        lambda: hass.data.get(DOMAIN, {}).get("manager"),
+        interval=METRICS_REFRESH_INTERVAL,
     )
 
-    return True
+    try:
+        await exporter.start()
+    except OSError as exc:
+        _LOGGER.error(
+            "Growatt THOR metrics could not listen on %s:%s: %s", host, port, exc
+        )
+        return
+
+    hass.data[DOMAIN]["metrics"] = exporter
+    hass.data[DOMAIN]["metrics_key"] = (host, port)
+
+
+async def _async_stop_metrics(hass: HomeAssistant) -> None:
+    data = hass.data.get(DOMAIN, {})
+    data.pop("metrics_key", None)
+
+    exporter = data.pop("metrics", None)
+    if exporter:
+        await exporter.close()
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Unload Growatt THOR config entry."""
+    """
+    Unload Growatt THOR config entry.
+
+    De websocket server en live charge points blijven nog even bestaan,
+    zodat een reload (bv. na een opties-wijziging) de THOR niet laat
+    herverbinden en opnieuw booten. Zonder nieuwe setup binnen
+    TRANSPORT_CLOSE_DELAY worden ze alsnog gesloten.
+    """
 
     unload_ok = await hass.config_entries.async_unload_platforms(
         entry, PLATFORMS
     )
 
-    server = hass.data.get(DOMAIN, {}).get("server")
-    if server:
-        server.close()
-        await server.wait_closed()
-
     if unload_ok:
-        hass.data[DOMAIN].pop("server", None)
-        hass.data[DOMAIN].pop("coordinator", None)
-        hass.data[DOMAIN].pop("charge_point", None)
+        async def _async_close_transport(_now) -> None:
+            hass.data[DOMAIN].pop("cancel_close", None)
+            await _async_stop_transport(hass)
+            await _async_stop_metrics(hass)
+            hass.data[DOMAIN].pop("coordinator", None)
+
+        hass.data[DOMAIN]["cancel_close"] = async_call_later(
+            hass, TRANSPORT_CLOSE_DELAY, _async_close_transport
+        )
 
     return unload_ok
 
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Integratie verwijderd: verbindingen direct sluiten."""
+
+    data = hass.data.get(DOMAIN, {})
+
+    cancel_close = data.pop("cancel_close", None)
+    if cancel_close:
+        cancel_close()
+
+    await _async_stop_transport(hass)
+    await _async_stop_metrics(hass)
+    data.pop("coordinator", None)
+
+    commands = data.pop("commands", None)
+    if commands:
+        await commands.async_remove()
+
+    cost = data.pop("cost", None)
+    if cost:
+        await cost.async_remove()
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def _async_stop_transport(hass: HomeAssistant) -> None:
+    """Sluit de OCPP server of de gateway event stream."""
+
+    data = hass.data.get(DOMAIN, {})
+    data.pop("transport_key", None)
+
+    # Drain: lopende CALLs krijgen DEFAULT_DRAIN_TIMEOUT om af te ronden
+    manager = data.pop("manager", None)
+    if manager:
+        await manager.async_close()
+    data.pop("codec", None)
+
+    stream_task = data.pop("event_stream", None)
+    if stream_task:
+        stream_task.cancel()
+        try:
+            await stream_task
+        except asyncio.CancelledError:
+            pass
+
+    data.pop("charge_point", None)
@@ -0,0 +1,251 @@
+"""
+Streaming detectie van installatieproblemen uit de MeterValues.
+
+Per sample alleen een paar EWMA-updates (gemiddelde + variantie), dus O(1)
+en geen historie:
+
+- ``phase_imbalance``  stroom over de actieve fases loopt te ver uiteen
+- ``voltage_sag``      spanning duidelijk onder de eigen basislijn, of
+                       onder VOLTAGE_MIN
+- ``overheating``      temperatuur te hoog, of hoog en snel stijgend
+
+Een anomalie gaat pas aan (en weer uit) na ANOMALY_DEBOUNCE opeenvolgende
+evaluaties, zodat één uitschieter geen event oplevert. ``details`` zijn de
+waarden op het moment dat hij aan ging, en leeg zolang hij uit is.
+"""
+
+import math
+import time
+
+from .const import (
+    ANOMALY_ALPHA,
+    ANOMALY_BASELINE_ALPHA,
+    ANOMALY_SAG_BASELINE_ALPHA,
+    ANOMALY_WARMUP,
+    ANOMALY_DEBOUNCE,
+    IMBALANCE_MIN_CURRENT,
+    IMBALANCE_RATIO,
+    VOLTAGE_MIN,
+    VOLTAGE_SAG_PERCENT,
+    VOLTAGE_SAG_SIGMA,
+    TEMPERATURE_MAX,
+    TEMPERATURE_WARN,
+    TEMPERATURE_RISE_RATE,
+    TEMPERATURE_MIN_INTERVAL,
+)
+
+PHASE_IMBALANCE = "phase_imbalance"
+VOLTAGE_SAG = "voltage_sag"
+OVERHEATING = "overheating"
+
+ANOMALIES = (PHASE_IMBALANCE, VOLTAGE_SAG, OVERHEATING)
+
+
+class Ewma:
+    """Exponentieel gewogen gemiddelde en variantie."""
+
+    __slots__ = ("alpha", "mean", "var", "count")
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = None
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value, alpha=None):
+        alpha = self.alpha if alpha is None else alpha
+        self.count += 1
+        if self.mean is None:
+            self.mean = value
+            return
+
+        diff = value - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+
+class _Debounce:
+    """Schakelt pas om na ``count`` opeenvolgende gelijke uitkomsten."""
+
+    __slots__ = ("count", "active", "_streak")
+
+    def __init__(self, count):
+        self.count = count
+        self.active = False
+        self._streak = 0
+
+    def update(self, condition) -> bool:
+        """Geeft True als ``active`` omgeslagen is."""
+        if condition == self.active:
+            self._streak = 0
+            return False
+
+        self._streak += 1
+        if self._streak < self.count:
+            return False
+
+        self.active = condition
+        self._streak = 0
+        return True
+
+
+class AnomalyDetector:
+    """Lopende statistiek en anomalie-status voor één THOR."""
+
+    def __init__(self):
+        self.currents = {}       # {fase: Ewma}, alleen fases met stroom
+        self.loaded_phases = set()   # fases die ooit stroom voerden
+        self.voltages = {}       # {fase: Ewma}, trage basislijn
+        self.temperature = Ewma(ANOMALY_ALPHA)
+        self.temperature_rate = Ewma(ANOMALY_ALPHA)   # °C per minuut
+
+        self.latest_temperature = None
+        self._rate_reference = None     # (tijd in s, °C) voor de stijgsnelheid
+        self._sagging = {}              # {fase: details}, alleen fases in een dip
+
+        self._state = {name: _Debounce(ANOMALY_DEBOUNCE) for name in ANOMALIES}
+        self.details = {name: {} for name in ANOMALIES}
+
+        # Wat er sinds de vorige evaluate() binnenkwam
+        self._dirty = set()
+
+    def is_active(self, name) -> bool:
+        return self._state[name].active
+
+    @property
+    def imbalance_possible(self) -> bool:
+        """Pas met twee fases die stroom voerden kan er onbalans zijn."""
+        return len(self.loaded_phases) >= 2
+
+    # ─────────────────────────────
+    # Samples
+    # ─────────────────────────────
+
+    def add_current(self, phase, value):
+        if value < IMBALANCE_MIN_CURRENT:
+            # Fase voert geen stroom (meer): opnieuw beginnen als hij terugkomt,
+            # anders loopt het oude gemiddelde nog samples lang na
+            self.currents.pop(phase, None)
+            self._dirty.add(PHASE_IMBALANCE)
+            return
+
+        self.loaded_phases.add(phase)
+        stats = self.currents.get(phase)
+        if stats is None:
+            stats = self.currents[phase] = Ewma(ANOMALY_ALPHA)
+        stats.update(value)
+        self._dirty.add(PHASE_IMBALANCE)
+
+    def add_voltage(self, phase, value):
+        stats = self.voltages.get(phase)
+        if stats is None:
+            stats = self.voltages[phase] = Ewma(ANOMALY_BASELINE_ALPHA)
+
+        threshold = None
+        if stats.count >= ANOMALY_WARMUP:
+            threshold = stats.mean - max(
+                stats.mean * VOLTAGE_SAG_PERCENT / 100,
+                stats.std * VOLTAGE_SAG_SIGMA,
+            )
+
+        sagging = value < VOLTAGE_MIN or (threshold is not None and value < threshold)
+
+        if sagging:
+            self._sagging[phase] = {
+                "voltage": value,
+                "baseline": round(stats.mean, 1) if stats.mean is not None else None,
+            }
+            # Tijdens een dip zakt de basislijn maar heel langzaam mee: een
+            # korte dip blijft zichtbaar, een blijvend lagere netspanning
+            # (binnen de norm) wordt na verloop van tijd de nieuwe basislijn
+            stats.update(value, ANOMALY_SAG_BASELINE_ALPHA)
+        else:
+            self._sagging.pop(phase, None)
+            stats.update(value)
+
+        self._dirty.add(VOLTAGE_SAG)
+
+    def add_temperature(self, value, when=None):
+        """
+        ``when``: tijdstip van de meting in seconden (timestamp van de
+        meter_value). Een achterstand na een reconnect komt in één bericht
+        binnen; de verwerkingstijd zegt dan niets over de stijgsnelheid.
+        """
+        when = time.time() if when is None else when
+
+        reference = self._rate_reference
+        elapsed = None if reference is None else when - reference[0]
+        if elapsed is None or elapsed < 0:
+            # Eerste sample, of de klok van de THOR sprong terug
+            self._rate_reference = (when, value)
+        elif elapsed >= TEMPERATURE_MIN_INTERVAL:
+            self.temperature_rate.update((value - reference[1]) / elapsed * 60)
+            self._rate_reference = (when, value)
+
+        self.latest_temperature = value
+        self.temperature.update(value)
+        self._dirty.add(OVERHEATING)
+
+    # ─────────────────────────────
+    # Evaluatie
+    # ─────────────────────────────
+
+    def evaluate(self):
+        """
+        Beoordeel alleen wat sinds de vorige aanroep nieuwe samples kreeg.
+        Geeft de namen terug van anomalieën die aan of uit gegaan zijn.
+        """
+        changed = []
+
+        for name in ANOMALIES:
+            if name not in self._dirty:
+                continue
+            condition, details = getattr(self, f"_check_{name}")()
+            if self._state[name].update(condition):
+                changed.append(name)
+                self.details[name] = details if condition else {}
+
+        self._dirty.clear()
+        return changed
+
+    # Iedere check geeft (conditie, details) terug
+
+    def _check_phase_imbalance(self):
+        # Een 1-fase auto op een 3-fase THOR is geen onbalans: alleen fases
+        # die echt stroom voeren staan in self.currents
+        active = {phase: stats.mean for phase, stats in self.currents.items()}
+        if len(active) < 2:
+            return False, {}
+
+        mean = sum(active.values()) / len(active)
+        ratio = (max(active.values()) - min(active.values())) / mean
+
+        return ratio > IMBALANCE_RATIO, {
+            "ratio": round(ratio, 3),
+            "currents": {phase: round(value, 2) for phase, value in active.items()},
+        }
+
+    def _check_voltage_sag(self):
+        return bool(self._sagging), dict(self._sagging)
+
+    def _check_overheating(self):
+        latest = self.latest_temperature
+        mean = self.temperature.mean
+        rate = self.temperature_rate.mean
+
+        # Harde grens op de laatste meting: het gemiddelde loopt samples achter
+        condition = latest >= TEMPERATURE_MAX or (
+            mean >= TEMPERATURE_WARN
+            and rate is not None
+            and rate >= TEMPERATURE_RISE_RATE
+        )
+        return condition, {
+            "temperature": latest,
+            "average": round(mean, 1),
+            "rise_per_minute": round(rate, 2) if rate is not None else None,
+        }
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorEntity,
+    BinarySensorDeviceClass,
+)
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .anomaly import PHASE_IMBALANCE, VOLTAGE_SAG, OVERHEATING
+from .const import DOMAIN, SIGNAL_NEW_ANOMALY, SIGNAL_STALE_MEASURAND
+from .sensor import ENTITY_KEYS
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    coordinator = hass.data[DOMAIN]["coordinator"]
+    registry = er.async_get(hass)
+
+    entities = [
+        AnomalySensor(coordinator, entry, VOLTAGE_SAG, "Voltage Sag", "mdi:flash-alert"),
+        AnomalySensor(coordinator, entry, OVERHEATING, "Overheating", "mdi:thermometer-alert"),
+    ]
+
+    # Fase-onbalans alleen als de THOR meer dan één fase belast; anders komt
+    # hij via SIGNAL_NEW_ANOMALY zodra dat zo blijkt
+    imbalance_added = coordinator.anomalies.imbalance_possible or _restore_imbalance(
+        registry, coordinator, entry
+    )
+    if imbalance_added:
+        entities.append(_imbalance_sensor(coordinator, entry))
+
+    async_add_entities(entities)
+
+    @callback
+    def _async_new_anomaly(name):
+        nonlocal imbalance_added
+        if name == PHASE_IMBALANCE and not imbalance_added:
+            imbalance_added = True
+            async_add_entities([_imbalance_sensor(coordinator, entry)])
+
+    @callback
+    def _async_stale_measurand(key):
+        # Hersteld uit de registry, maar de THOR blijkt maar één fase te hebben
+        nonlocal imbalance_added
+        if key[0] != "Current.Import" or coordinator.anomalies.imbalance_possible:
+            return
+        if len(_current_phases(coordinator.seen)) >= 2:
+            return
+        entity_id = registry.async_get_entity_id(
+            "binary_sensor", DOMAIN, _imbalance_unique_id(entry)
+        )
+        if entity_id:
+            registry.async_remove(entity_id)
+        imbalance_added = False
+
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_NEW_ANOMALY, _async_new_anomaly)
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_STALE_MEASURAND, _async_stale_measurand)
+    )
+
+
+def _imbalance_sensor(coordinator, entry):
+    return AnomalySensor(coordinator, entry, PHASE_IMBALANCE, "Phase Imbalance", "mdi:sine-wave")
+
+
+def _imbalance_unique_id(entry):
+    return f"{entry.entry_id}_{PHASE_IMBALANCE}"
+
+
+def _current_phases(keys):
+    return {phase for measurand, phase in keys if measurand == "Current.Import" and phase}
+
+
+def _restore_imbalance(registry, coordinator, entry):
+    """
+    Na een herstart: alleen terug als deze entry ook stroomsensoren voor
+    meerdere fases heeft. Oudere versies maakten hem altijd aan; bij een
+    1-fase THOR ruimen we hem hier op.
+    """
+    entity_id = registry.async_get_entity_id(
+        "binary_sensor", DOMAIN, _imbalance_unique_id(entry)
+    )
+    if entity_id is None:
+        return False
+
+    prefix = f"{entry.entry_id}_"
+    keys = {
+        ENTITY_KEYS.get(registry_entry.unique_id.removeprefix(prefix))
+        for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id)
+        if registry_entry.domain == "sensor"
+    }
+    keys.discard(None)
+
+    if len(_current_phases(keys | coordinator.seen)) >= 2:
+        return True
+
+    registry.async_remove(entity_id)
+    return False
+
+
+# ─────────────────────────────
+# Anomalieën (anomaly.py)
+# ─────────────────────────────
+
+class AnomalySensor(CoordinatorEntity, BinarySensorEntity):
+    _attr_has_entity_name = True
+    _attr_device_class = BinarySensorDeviceClass.PROBLEM
+
+    def __init__(self, coordinator, entry, anomaly, name, icon):
+        super().__init__(coordinator)
+        self.anomaly = anomaly
+        self._attr_name = name
+        self._attr_icon = icon
+        self._attr_unique_id = f"{entry.entry_id}_{anomaly}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, entry.entry_id)},
+            "name": "Growatt THOR EV Charger",
+            "manufacturer": "Growatt",
+            "model": "THOR",
+        }
+
+    @property
+    def is_on(self):
+        return self.coordinator.anomalies.is_active(self.anomaly)
+
+    @property
+    def extra_state_attributes(self):
+        return self.coordinator.anomalies.details[self.anomaly]
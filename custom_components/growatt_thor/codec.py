@@ -0,0 +1,175 @@
+"""
+OCPP berichten decoderen en schema-validatie per action.
+
+De ocpp library decodeert ieder bericht met ``json`` en valideert iedere
+CALL (en ons antwoord) tegen het JSON schema. Voor MeterValues en
+Heartbeat is dat het grootste deel van de CPU per bericht. De codec:
+
+- decodeert met orjson als dat geïnstalleerd is, anders ``json``; met
+  ``full`` validatie is dat niet merkbaar sneller dan de library, de winst
+  zit in ``sampled``/``off``
+- compileert de validators vooraf (``warm_up``), zodat het eerste bericht
+  per action geen schema van disk hoeft te lezen
+- bepaalt per action of er gevalideerd wordt: ``full``, ``sampled``
+  (1 op de ``sample_rate`` berichten) of ``off``
+"""
+
+import json
+import logging
+
+from ocpp.exceptions import (
+    FormatViolationError,
+    PropertyConstraintViolationError,
+    ProtocolError,
+)
+from ocpp.messages import Call, CallError, CallResult, MessageType, get_validator
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optionele dependency
+    orjson = None
+
+_LOGGER = logging.getLogger(__name__)
+
+VALIDATE_FULL = "full"
+VALIDATE_SAMPLED = "sampled"
+VALIDATE_OFF = "off"
+
+VALIDATION_MODES = (VALIDATE_FULL, VALIDATE_SAMPLED, VALIDATE_OFF)
+
+_MESSAGE_CLASSES = {
+    MessageType.Call: Call,
+    MessageType.CallResult: CallResult,
+    MessageType.CallError: CallError,
+}
+
+
+def parse_policy(value) -> dict:
+    """
+    ``"Heartbeat=off, MeterValues=sampled"`` (of een lijst ``ACTION=MODE``
+    items) naar een policy dict. ValueError bij een ongeldig item.
+    """
+    items = value.split(",") if isinstance(value, str) else value
+    policy = {}
+    for item in items:
+        item = item.strip()
+        if not item:
+            continue
+        action, sep, mode = (part.strip() for part in item.partition("="))
+        if not sep or not action or mode not in VALIDATION_MODES:
+            raise ValueError(f"Invalid validation setting: {item!r}")
+        policy[action] = mode
+    return policy
+
+
+def format_policy(policy) -> str:
+    return ", ".join(f"{action}={mode}" for action, mode in policy.items())
+
+
+class OcppCodec:
+    """Decoder + validatiebeleid, gedeeld door alle verbindingen van een server."""
+
+    def __init__(
+        self,
+        policy=None,
+        default=VALIDATE_FULL,
+        sample_rate=10,
+        use_orjson=True,
+    ):
+        self.default = default
+        self.sample_rate = max(1, int(sample_rate))
+        self.set_policy(policy)
+
+        if use_orjson and orjson is not None:
+            self.backend = "orjson"
+            self._loads = orjson.loads
+            self._decode_error = orjson.JSONDecodeError
+        else:
+            self.backend = "json"
+            self._loads = json.loads
+            self._decode_error = json.JSONDecodeError
+
+    # ─────────────────────────────
+    # Decoderen
+    # ─────────────────────────────
+
+    def unpack(self, raw):
+        """
+        Zelfde contract als ``ocpp.messages.unpack``: een Call, CallResult of
+        CallError, of een OCPPError bij een ongeldig bericht.
+        """
+        try:
+            msg = self._loads(raw)
+        except self._decode_error:
+            raise FormatViolationError(
+                details={"cause": "Message is not valid JSON", "ocpp_message": raw}
+            )
+
+        if not isinstance(msg, list):
+            raise ProtocolError(
+                details={
+                    "cause": (
+                        "OCPP message hasn't the correct format. It should be "
+                        f"a list, but got '{type(msg)}' instead"
+                    )
+                }
+            )
+        if not msg:
+            raise ProtocolError(
+                details={"cause": "Message does not contain MessageTypeId"}
+            )
+
+        cls = _MESSAGE_CLASSES.get(msg[0])
+        if cls is None:
+            raise PropertyConstraintViolationError(
+                details={"cause": f"MessageTypeId '{msg[0]}' isn't valid"}
+            )
+
+        try:
+            return cls(*msg[1:])
+        except TypeError:
+            raise ProtocolError(details={"cause": "Message is missing elements."})
+
+    # ─────────────────────────────
+    # Validatie
+    # ─────────────────────────────
+
+    def set_policy(self, policy):
+        """Nieuw beleid, ook voor een draaiende server (options reload)."""
+        policy = dict(policy or {})
+        for action, mode in policy.items():
+            if mode not in VALIDATION_MODES:
+                raise ValueError(f"Invalid validation mode for {action}: {mode}")
+        self.policy = policy
+        self._seen = {}
+
+    def mode(self, action):
+        return self.policy.get(action, self.default)
+
+    def should_validate(self, action) -> bool:
+        mode = self.mode(action)
+        if mode == VALIDATE_FULL:
+            return True
+        if mode == VALIDATE_OFF:
+            return False
+
+        # Sampled: het eerste bericht altijd, daarna 1 op sample_rate
+        count = self._seen.get(action, 0)
+        self._seen[action] = count + 1
+        return count % self.sample_rate == 0
+
+    def warm_up(self, actions, ocpp_version="1.6"):
+        """
+        Compileer de validators voor ``actions`` vooraf.
+
+        Leest de schema's van disk, dus in Home Assistant in de executor
+        aanroepen. De ocpp library cachet de validators daarna zelf.
+        """
+        for action in actions:
+            if self.mode(action) == VALIDATE_OFF:
+                continue
+            for message_type in (MessageType.Call, MessageType.CallResult):
+                try:
+                    get_validator(message_type, action, ocpp_version)
+                except OSError:
+                    _LOGGER.debug("No %s schema for %s", message_type, action)
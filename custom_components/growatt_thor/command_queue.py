@@ -0,0 +1,239 @@
+"""
+Persistente wachtrij voor commando's naar de THOR.
+
+Commando's voor een THOR die (nog) niet verbonden is worden bewaard en na de
+volgende BootNotification in volgorde verstuurd. Per config key telt alleen
+de laatste waarde; een dubbele refresh wordt samengevoegd.
+
+Iedere statuswijziging gaat als ``growatt_thor_command_status`` event over de
+bus, zodat automations niet blind hoeven te herhalen:
+
+    queued → sending → delivered | rejected | failed
+    queued → superseded   (vervangen door een nieuwere waarde)
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    EVENT_COMMAND_STATUS,
+    COMMAND_STORAGE_VERSION,
+    COMMAND_HISTORY_SIZE,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commando's voor een THOR waarvan we het id nog niet kennen
+ANY_CHARGE_POINT = "*"
+
+KIND_REFRESH = "refresh"
+KIND_CHANGE_CONFIGURATION = "change_configuration"
+
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_DELIVERED = "delivered"
+STATUS_REJECTED = "rejected"
+STATUS_FAILED = "failed"
+STATUS_SUPERSEDED = "superseded"
+
+
+def _created(command):
+    # Als datetime: isoformat() laat de microseconden weg als die 0 zijn
+    return datetime.fromisoformat(command["created"].rstrip("Z"))
+
+
+class CommandQueue:
+    """Wachtrij per charge point id, bewaard in .storage/growatt_thor.commands."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._store = Store(hass, COMMAND_STORAGE_VERSION, f"{DOMAIN}.commands")
+        self._queues = {}     # {cp_id: [command, ...]}
+        self._history = []    # afgeronde commando's, nieuwste laatst
+        self._lock = asyncio.Lock()
+
+    async def async_load(self):
+        data = await self._store.async_load() or {}
+        self._queues = data.get("queues", {})
+        self._history = data.get("history", [])
+
+        # Onderbroken tijdens het versturen (HA herstart): opnieuw proberen
+        for queue in self._queues.values():
+            for command in queue:
+                command["status"] = STATUS_QUEUED
+
+        pending = sum(len(queue) for queue in self._queues.values())
+        if pending:
+            _LOGGER.info("Growatt THOR: %d queued command(s) restored", pending)
+
+    async def async_remove(self):
+        """Integratie verwijderd: opgeslagen wachtrij weggooien."""
+        await self._store.async_remove()
+
+    # ─────────────────────────────
+    # Toevoegen
+    # ─────────────────────────────
+
+    def enqueue(self, cp_id, kind, key=None, value=None) -> dict:
+        queue = self._queues.setdefault(cp_id or ANY_CHARGE_POINT, [])
+
+        command = {
+            "id": uuid.uuid4().hex,
+            "charge_point": cp_id or ANY_CHARGE_POINT,
+            "kind": kind,
+            "key": key,
+            "value": value,
+            "status": STATUS_QUEUED,
+            "created": datetime.utcnow().isoformat() + "Z",
+            "result": None,
+        }
+        queued = self._merge(queue, command)
+        if queued is command:
+            self._fire(command)
+            self._save()
+        return queued
+
+    def _merge(self, queue, command):
+        """
+        ``command`` achteraan ``queue``: één refresh, en per config key alleen
+        de laatste waarde. Geeft het commando terug dat nu in de wachtrij staat.
+        """
+        for old in list(queue):
+            # Een commando dat al onderweg is laten we met rust
+            if old["kind"] != command["kind"] or old["status"] != STATUS_QUEUED:
+                continue
+            if command["kind"] == KIND_REFRESH:
+                # Er staat al een refresh klaar: die volstaat
+                return old
+            if (
+                command["kind"] == KIND_CHANGE_CONFIGURATION
+                and old["key"] == command["key"]
+            ):
+                queue.remove(old)
+                self._finish(old, STATUS_SUPERSEDED)
+
+        queue.append(command)
+        return command
+
+    def _adopt(self, cp_id):
+        """
+        Commando's van voordat het id bekend was bij die van ``cp_id`` voegen,
+        op volgorde van aanmaken: een oudere waarde mag een nieuwere niet
+        overschrijven.
+        """
+        orphans = self._queues.pop(ANY_CHARGE_POINT, [])
+        if not orphans:
+            return
+
+        # sorted() is stabiel: bij gelijke tijd eerst de eigen wachtrij
+        commands = sorted(self._queues.get(cp_id, []) + orphans, key=_created)
+        queue = self._queues[cp_id] = []
+        for command in commands:
+            command["charge_point"] = cp_id
+            if self._merge(queue, command) is not command:
+                self._finish(command, STATUS_SUPERSEDED)
+
+    def get(self, command_id):
+        for queue in self._queues.values():
+            for command in queue:
+                if command["id"] == command_id:
+                    return command
+        for command in reversed(self._history):
+            if command["id"] == command_id:
+                return command
+        return None
+
+    def pending(self, cp_id):
+        return list(self._queues.get(cp_id, [])) + list(
+            self._queues.get(ANY_CHARGE_POINT, [])
+        )
+
+    # ─────────────────────────────
+    # Versturen
+    # ─────────────────────────────
+
+    async def async_flush(self, cp):
+        """Verstuur alle commando's voor ``cp`` (en zonder id) in volgorde."""
+        # Pas hier: de ocpp stack is dan geladen (er is een verbinding)
+        from ocpp.exceptions import OCPPError
+        from websockets.exceptions import ConnectionClosed
+
+        async with self._lock:
+            self._adopt(cp.id)
+            queue = self._queues.get(cp.id, [])
+            while queue:
+                command = queue[0]
+                command["status"] = STATUS_SENDING
+                self._fire(command)
+
+                try:
+                    status, result = await self._execute(cp, command)
+                except (ConnectionClosed, asyncio.TimeoutError) as exc:
+                    # Verbinding weg of timeout: laten staan voor de
+                    # volgende boot
+                    reason = str(exc) or type(exc).__name__
+                    _LOGGER.warning(
+                        "Growatt THOR command %s not delivered: %s",
+                        command["kind"],
+                        reason,
+                    )
+                    command["status"] = STATUS_QUEUED
+                    command["result"] = reason
+                    self._fire(command)
+                    self._save()
+                    return
+                except Exception as exc:
+                    # Ongeldig commando (bv. te lange key) of een bug:
+                    # opnieuw proberen helpt niet en zou de rest van de
+                    # wachtrij blokkeren
+                    _LOGGER.error(
+                        "Growatt THOR command %s failed: %s",
+                        command["kind"],
+                        exc,
+                        exc_info=not isinstance(exc, OCPPError),
+                    )
+                    status, result = STATUS_FAILED, str(exc) or type(exc).__name__
+
+                queue.pop(0)
+                command["result"] = result
+                self._finish(command, status)
+
+            self._queues.pop(cp.id, None)
+            self._save()
+
+    async def _execute(self, cp, command):
+        if command["kind"] == KIND_REFRESH:
+            await cp.refresh()
+            return STATUS_DELIVERED, None
+
+        if command["kind"] == KIND_CHANGE_CONFIGURATION:
+            result = await cp.change_configuration(command["key"], command["value"])
+            if result in ("Accepted", "RebootRequired"):
+                return STATUS_DELIVERED, result
+            return STATUS_REJECTED, result
+
+        return STATUS_FAILED, f"Unknown command {command['kind']}"
+
+    # ─────────────────────────────
+    # Intern
+    # ─────────────────────────────
+
+    def _finish(self, command, status):
+        command["status"] = status
+        self._history.append(command)
+        del self._history[:-COMMAND_HISTORY_SIZE]
+        self._fire(command)
+        self._save()
+
+    def _fire(self, command):
+        self.hass.bus.async_fire(EVENT_COMMAND_STATUS, dict(command))
+
+    def _save(self):
+        self._store.async_delay_save(
+            lambda: {"queues": self._queues, "history": self._history}, 1
+        )
@@ -1,8 +1,59 @@
+import importlib
+
 from homeassistant import config_entries
 from homeassistant.core import callback
+from homeassistant.helpers.selector import EntitySelector, EntitySelectorConfig
 import voluptuous as vol
 
-from .const import DOMAIN, DEFAULT_PORT, DEFAULT_HOST, CONF_HOST, CONF_PORT
+from .const import (
+    DOMAIN,
+    DEFAULT_PORT,
+    DEFAULT_HOST,
+    CONF_HOST,
+    CONF_PORT,
+    CONF_EVENT_STREAM,
+    CONF_CHARGE_POINT_ID,
+    CONF_METRICS_PORT,
+    DEFAULT_METRICS_PORT,
+    CONF_PRICE_ENTITY,
+    DEFAULT_EVENT_PORT,
+    CONF_VALIDATION_POLICY,
+    DEFAULT_VALIDATION_POLICY,
+)
+from .event_stream import parse_address
+
+
+async def _async_import_codec(hass):
+    # codec.py importeert de ocpp library: niet in de event loop
+    return await hass.async_add_executor_job(
+        importlib.import_module, f"{__package__}.codec"
+    )
+
+
+# Prijs per kWh: een sensor (dynamisch tarief, template) of een input_number
+PRICE_ENTITY_SELECTOR = EntitySelector(
+    EntitySelectorConfig(domain=["sensor", "input_number"])
+)
+
+
+def _validate(user_input, codec=None) -> dict:
+    """Fouten per veld, zodat de setup later niet op de achtergrond faalt."""
+    errors = {}
+
+    event_stream = user_input.get(CONF_EVENT_STREAM)
+    if event_stream:
+        try:
+            parse_address(event_stream, DEFAULT_EVENT_PORT)
+        except ValueError:
+            errors[CONF_EVENT_STREAM] = "invalid_address"
+
+    if codec is not None and CONF_VALIDATION_POLICY in user_input:
+        try:
+            codec.parse_policy(user_input[CONF_VALIDATION_POLICY])
+        except ValueError:
+            errors[CONF_VALIDATION_POLICY] = "invalid_validation_policy"
+
+    return errors
 
 
 class GrowattThorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -10,12 +61,21 @@ class GrowattThorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return GrowattThorOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
+        errors = {}
+
         if user_input is not None:
-            return self.async_create_entry(
-                title="Growatt THOR EV Charger",
-                data=user_input,
-            )
+            errors = _validate(user_input)
+            if not errors:
+                return self.async_create_entry(
+                    title="Growatt THOR EV Charger",
+                    data=user_input,
+                )
 
         return self.async_show_form(
             step_id="user",
@@ -23,7 +83,87 @@ class GrowattThorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 {
                     vol.Required(CONF_HOST, default=DEFAULT_HOST): str,
                     vol.Required(CONF_PORT, default=DEFAULT_PORT): int,
+                    vol.Optional(CONF_EVENT_STREAM, default=""): str,
+                    vol.Optional(CONF_CHARGE_POINT_ID, default=""): str,
+                    vol.Optional(
+                        CONF_METRICS_PORT, default=DEFAULT_METRICS_PORT
+                    ): int,
+                    vol.Optional(CONF_PRICE_ENTITY): PRICE_ENTITY_SELECTOR,
                 }
             ),
+            errors=errors,
         )
 
+
+class GrowattThorOptionsFlow(config_entries.OptionsFlow):
+    """
+    Opties voor Growatt THOR.
+
+    Een wijziging herlaadt de integratie; verbindingen blijven bestaan zolang
+    host/poort/event stream gelijk blijven.
+    """
+
+    def __init__(self, config_entry):
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        errors = {}
+        codec = await _async_import_codec(self.hass)
+
+        if user_input is not None:
+            errors = _validate(user_input, codec)
+            if not errors:
+                # Een leeg gelaten selector ontbreekt in user_input; expliciet
+                # leeg opslaan, anders blijft de waarde uit entry.data gelden
+                return self.async_create_entry(
+                    title="",
+                    data={
+                        **user_input,
+                        CONF_PRICE_ENTITY: user_input.get(CONF_PRICE_ENTITY, ""),
+                    },
+                )
+
+        # Bij een fout de ingevulde waarden laten staan
+        current = {**self._entry.data, **self._entry.options, **(user_input or {})}
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_HOST, default=current.get(CONF_HOST, DEFAULT_HOST)
+                    ): str,
+                    vol.Required(
+                        CONF_PORT, default=current.get(CONF_PORT, DEFAULT_PORT)
+                    ): int,
+                    vol.Optional(
+                        CONF_EVENT_STREAM,
+                        default=current.get(CONF_EVENT_STREAM, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_CHARGE_POINT_ID,
+                        default=current.get(CONF_CHARGE_POINT_ID, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_METRICS_PORT,
+                        default=current.get(CONF_METRICS_PORT, DEFAULT_METRICS_PORT),
+                    ): int,
+                    # suggested_value i.p.v. default: zo kan het veld leeg
+                    vol.Optional(
+                        CONF_PRICE_ENTITY,
+                        description={
+                        "suggested_value": current.get(CONF_PRICE_ENTITY) or None
+                    },
+                    ): PRICE_ENTITY_SELECTOR,
+                    # Leeg = alles valideren (zoals voor de codec)
+                    vol.Optional(
+                        CONF_VALIDATION_POLICY,
+                        default=current.get(
+                            CONF_VALIDATION_POLICY,
+                            codec.format_policy(DEFAULT_VALIDATION_POLICY),
+                        ),
+                    ): str,
+                }
+            ),
+            errors=errors,
+        )
@@ -0,0 +1,246 @@
+"""
+Levenscyclus van de websocket verbindingen van de OCPP server.
+
+De ConnectionManager houdt per verbinding een Session bij en regelt:
+
+- limieten: maximaal aantal verbindingen, totaal en per IP-adres
+- liveness: websocket pings (half-open TCP) en idle-detectie op OCPP niveau
+- afsluiten: eerst geen nieuwe verbindingen meer, dan lopende CALLs laten
+  afronden (tot een deadline), pas daarna de sockets dicht
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from .const import (
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_CONNECTIONS_PER_IP,
+    DEFAULT_PING_INTERVAL,
+    DEFAULT_PING_TIMEOUT,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_DRAIN_TIMEOUT,
+    IDLE_CHECK_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CONNECTING = "connecting"   # verbonden, nog geen OCPP bericht
+STATE_ACTIVE = "active"
+STATE_DRAINING = "draining"       # server sluit, lopende CALLs afronden
+STATE_CLOSED = "closed"
+
+# Websocket close codes (RFC 6455)
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class Session:
+    """Eén websocket verbinding (en de bijbehorende charge point)."""
+
+    def __init__(self, cp_id, websocket):
+        self.cp_id = cp_id
+        self.websocket = websocket
+        self.remote_ip = (websocket.remote_address or ("?",))[0]
+        self.connected_at = time.monotonic()
+        self.charge_point = None
+        self.superseded = False
+        self.counted = False   # tellers al in _closed_counts
+        self._state = STATE_CONNECTING
+
+    @property
+    def state(self):
+        if self._state == STATE_CONNECTING and self.charge_point is not None:
+            if self.charge_point.last_message is not None:
+                return STATE_ACTIVE
+        return self._state
+
+    @property
+    def idle_seconds(self):
+        last = self.connected_at
+        if self.charge_point is not None and self.charge_point.last_message:
+            last = self.charge_point.last_message
+        return time.monotonic() - last
+
+
+class ConnectionManager:
+    """Houdt alle sessies van één OCPP server bij."""
+
+    def __init__(
+        self,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        max_connections_per_ip=DEFAULT_MAX_CONNECTIONS_PER_IP,
+        ping_interval=DEFAULT_PING_INTERVAL,
+        ping_timeout=DEFAULT_PING_TIMEOUT,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        drain_timeout=DEFAULT_DRAIN_TIMEOUT,
+    ):
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.drain_timeout = drain_timeout
+
+        self.server = None
+        self.sessions = set()
+        self.rejected = 0
+        self._draining = False
+        self._sweeper = None
+        self._closing = set()
+
+        # Berichttellers van gesloten sessies (voor metrics)
+        self._closed_counts = Counter()
+
+    # ─────────────────────────────
+    # Server
+    # ─────────────────────────────
+
+    def attach(self, server):
+        self.server = server
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+
+    async def async_close(self, timeout=None):
+        """Netjes afsluiten: niets nieuws aannemen, lopende CALLs afronden."""
+        if self.server is None:
+            return
+
+        timeout = self.drain_timeout if timeout is None else timeout
+        self._draining = True
+
+        # Alleen de listening socket dicht; bestaande verbindingen blijven
+        # open zodat antwoorden op lopende CALLs nog binnen kunnen komen
+        self.server.server.close()
+
+        for session in self.sessions:
+            session._state = STATE_DRAINING
+
+        waiters = [
+            asyncio.ensure_future(session.charge_point.wait_idle())
+            for session in self.sessions
+            if session.charge_point is not None
+        ]
+        if waiters:
+            _LOGGER.info(
+                "Draining %d OCPP connection(s) (max %ss)", len(waiters), timeout
+            )
+            _, pending = await asyncio.wait(waiters, timeout=timeout)
+            for waiter in pending:
+                waiter.cancel()
+            if pending:
+                _LOGGER.warning(
+                    "%d OCPP connection(s) still busy after %ss, closing anyway",
+                    len(pending),
+                    timeout,
+                )
+
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = None
+
+    # ─────────────────────────────
+    # Sessies
+    # ─────────────────────────────
+
+    def admit(self, cp_id, websocket):
+        """Nieuwe verbinding: Session teruggeven, of None als die geweigerd wordt."""
+        if self._draining:
+            return None
+
+        session = Session(cp_id, websocket)
+
+        # Dezelfde THOR opnieuw verbonden: de oude (vaak half-open)
+        # verbinding is achterhaald. Eerst opruimen, zodat die niet
+        # meetelt voor de limieten hieronder.
+        for old in [s for s in self.sessions if s.cp_id == cp_id]:
+            _LOGGER.info("THOR %s reconnected, closing previous session", cp_id)
+            old.superseded = True
+            self._close_session(old, "Replaced by new connection")
+
+        if len(self.sessions) >= self.max_connections:
+            _LOGGER.warning(
+                "Rejecting %s: max %d connections reached",
+                cp_id,
+                self.max_connections,
+            )
+            self.rejected += 1
+            return None
+
+        same_ip = sum(1 for s in self.sessions if s.remote_ip == session.remote_ip)
+        if same_ip >= self.max_connections_per_ip:
+            _LOGGER.warning(
+                "Rejecting %s: max %d connections from %s",
+                cp_id,
+                self.max_connections_per_ip,
+                session.remote_ip,
+            )
+            self.rejected += 1
+            return None
+
+        self.sessions.add(session)
+        return session
+
+    def release(self, session):
+        session._state = STATE_CLOSED
+        self.sessions.discard(session)
+        self._count_closed(session)
+
+    def _count_closed(self, session):
+        # Eén keer, op het moment dat de sessie uit self.sessions gaat: anders
+        # zakt het totaal tot de close klaar is (Prometheus ziet een reset)
+        if session.counted or session.charge_point is None:
+            return
+        session.counted = True
+        self._closed_counts.update(session.charge_point.counters)
+
+    def message_counts(self) -> Counter:
+        """Aantal berichten per (richting, action), over alle sessies."""
+        total = Counter(self._closed_counts)
+        for session in self.sessions:
+            if session.charge_point is not None:
+                total.update(session.charge_point.counters)
+        return total
+
+    def count(self, state=None):
+        if state is None:
+            return len(self.sessions)
+        return sum(1 for s in self.sessions if s.state == state)
+
+    async def reject(self, websocket):
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Try again later")
+
+    # ─────────────────────────────
+    # Idle detectie
+    # ─────────────────────────────
+
+    async def _sweep(self):
+        """
+        Sluit verbindingen zonder OCPP verkeer.
+
+        Half-open TCP wordt al door de websocket pings gevonden; dit vangt
+        chargers die wel pongen maar niets meer sturen (ook geen Heartbeat).
+        """
+        while True:
+            await asyncio.sleep(IDLE_CHECK_INTERVAL)
+            for session in list(self.sessions):
+                if session.idle_seconds > self.idle_timeout:
+                    _LOGGER.warning(
+                        "THOR %s idle for %ds, closing connection",
+                        session.cp_id,
+                        session.idle_seconds,
+                    )
+                    self._close_session(session, "Idle timeout")
+
+    def _close_session(self, session, reason):
+        self.sessions.discard(session)
+        session._state = STATE_CLOSED
+        self._count_closed(session)
+        task = asyncio.ensure_future(
+            session.websocket.close(code=CLOSE_GOING_AWAY, reason=reason)
+        )
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
@@ -9,3 +9,78 @@ CONF_PORT = "port"
 
 OCPP_SUBPROTOCOL = "ocpp1.6"
 
+# Dispatcher signaal: eerste keer dat een (measurand, phase) binnenkomt
+SIGNAL_NEW_MEASURAND = f"{DOMAIN}_new_measurand"
+
+# Dispatcher signaal: (measurand, phase) die deze THOR toch niet stuurt
+SIGNAL_STALE_MEASURAND = f"{DOMAIN}_stale_measurand"
+
+# Dispatcher signaal: anomalie die voor deze THOR mogelijk blijkt (entity aanmaken)
+SIGNAL_NEW_ANOMALY = f"{DOMAIN}_new_anomaly"
+
+# Seconden dat de server na een unload blijft draaien, zodat een reload de
+# websocket verbindingen kan overnemen
+TRANSPORT_CLOSE_DELAY = 60
+
+# ── Verbindingen (connection_manager.py) ───
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_CONNECTIONS_PER_IP = 10
+
+DEFAULT_PING_INTERVAL = 15           # s, websocket ping (half-open TCP)
+DEFAULT_PING_TIMEOUT = 10            # s, wachten op pong
+DEFAULT_IDLE_TIMEOUT = 180           # s zonder OCPP bericht (3x heartbeat)
+DEFAULT_DRAIN_TIMEOUT = 10           # s voor lopende CALLs bij afsluiten
+IDLE_CHECK_INTERVAL = 30
+
+# ── OCPP codec (codec.py) ───
+# Schema-validatie per action: "full", "sampled" of "off"; rest is "full".
+# In Home Assistant te wijzigen via de optie CONF_VALIDATION_POLICY.
+CONF_VALIDATION_POLICY = "validation_policy"
+DEFAULT_VALIDATION_POLICY = {
+    "Heartbeat": "off",
+    "MeterValues": "sampled",
+}
+DEFAULT_VALIDATION_SAMPLE_RATE = 10  # sampled: 1 op 10 berichten valideren
+
+# ── Prometheus metrics (metrics.py) ───
+CONF_METRICS_PORT = "metrics_port"
+DEFAULT_METRICS_PORT = 0             # 0 = uit
+METRICS_REFRESH_INTERVAL = 10        # s tussen snapshots
+
+# ── Command queue (command_queue.py) ───
+EVENT_COMMAND_STATUS = f"{DOMAIN}_command_status"
+COMMAND_STORAGE_VERSION = 1
+COMMAND_HISTORY_SIZE = 50            # afgeronde commando's om status van te bewaren
+
+# ── Kosten (cost.py) ───
+CONF_PRICE_ENTITY = "price_entity"   # prijs per kWh (dynamisch of tijdsafhankelijk)
+COST_STORAGE_VERSION = 1
+COST_SAVE_DELAY = 30                 # s
+COST_MAX_DELTA_WH = 50000            # grotere sprong = teller reset, niet meetellen
+
+# ── Anomalieën (anomaly.py) ───
+EVENT_ANOMALY = f"{DOMAIN}_anomaly"
+ANOMALY_ALPHA = 0.2                  # EWMA voor stroom/temperatuur (~5 samples)
+ANOMALY_BASELINE_ALPHA = 0.02        # EWMA voor de spanning-basislijn (~50 samples)
+ANOMALY_SAG_BASELINE_ALPHA = 0.002   # basislijn tijdens een dip (~500 samples)
+ANOMALY_WARMUP = 10                  # samples voordat een basislijn meetelt
+ANOMALY_DEBOUNCE = 3                 # opeenvolgende samples om aan/uit te gaan
+
+IMBALANCE_MIN_CURRENT = 1.0          # A, fase telt pas mee boven deze stroom
+IMBALANCE_RATIO = 0.2                # (max - min) / gemiddelde over actieve fases
+
+VOLTAGE_MIN = 207.0                  # V, 230 V -10% (EN 50160)
+VOLTAGE_SAG_PERCENT = 5.0            # % onder de basislijn
+VOLTAGE_SAG_SIGMA = 4.0              # én minstens zoveel standaarddeviaties
+
+TEMPERATURE_MAX = 75.0               # °C, altijd een probleem
+TEMPERATURE_WARN = 60.0              # °C, probleem als hij ook snel stijgt
+TEMPERATURE_RISE_RATE = 1.0          # °C per minuut
+TEMPERATURE_MIN_INTERVAL = 1.0       # s tussen samples voor een stijgsnelheid
+
+# ── Standalone gateway (gateway.py) ───
+CONF_EVENT_STREAM = "event_stream"   # "host:port" van een gateway, leeg = ingebouwde server
+CONF_CHARGE_POINT_ID = "charge_point_id"  # THOR die gevolgd wordt, leeg = de eerste
+
+DEFAULT_EVENT_HOST = "127.0.0.1"
+DEFAULT_EVENT_PORT = 9100
@@ -1,11 +1,33 @@
 import logging
 from datetime import datetime
 
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
+from .anomaly import AnomalyDetector, PHASE_IMBALANCE
+from .const import (
+    SIGNAL_NEW_MEASURAND,
+    SIGNAL_STALE_MEASURAND,
+    SIGNAL_NEW_ANOMALY,
+    EVENT_ANOMALY,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 
+def _sample_time(entry):
+    """Timestamp van een meter_value in seconden, of None als die ontbreekt."""
+    value = entry.get("timestamp")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return None
+
+
 class GrowattCoordinator(DataUpdateCoordinator):
     """Coordinator voor Growatt THOR OCPP data."""
 
@@ -28,6 +50,25 @@ class GrowattCoordinator(DataUpdateCoordinator):
 
         self.temperature = None  # °C
 
+        # ── Overige measurands (SoC, Frequency, ...) ──
+        self.measurands = {}         # {(measurand, phase): waarde}
+        self.measurand_units = {}    # {(measurand, phase): unit uit de sample}
+
+        # (measurand, phase) combinaties die de THOR ooit gestuurd heeft;
+        # sensor.py maakt alleen daarvoor entities aan
+        self.seen = set()
+
+        # {measurand: fases} uit het eerste bericht met die measurand; een
+        # fase die daar niet in zit heeft deze THOR niet (1-fase aansluiting)
+        self.measurand_phases = {}
+
+        # ── Kosten (cost.py), None zonder prijs-entity ──
+        self.cost = None
+
+        # ── Anomalieën (anomaly.py) ────────
+        self.anomalies = AnomalyDetector()
+        self.imbalance_announced = False
+
         # ── Config (Growatt) ───────────────
         self.max_current = None
         self.external_limit_power = None
@@ -60,6 +101,8 @@ class GrowattCoordinator(DataUpdateCoordinator):
         self.transaction_id = transaction_id
         self.id_tag = id_tag
         self.status = "Charging"
+        if self.cost is not None:
+            self.cost.start_session()
         self.async_set_updated_data(True)
 
     def stop_transaction(self, reason=None):
@@ -73,44 +116,79 @@ class GrowattCoordinator(DataUpdateCoordinator):
 
     def process_meter_values(self, meter_values):
         updated = False
+        new_keys = []
+        phases = {}     # {measurand: fases} in dit bericht
 
         for entry in meter_values:
-            for sample in entry.get("sampledValue", []):
+            # ocpp zet de payload om naar snake_case (ook geneste keys), via
+            # de gateway event stream komt hij ook zo binnen
+            samples = entry.get("sampled_value", entry.get("sampledValue", []))
+
+            for sample in samples:
                 try:
                     value = float(sample.get("value"))
                 except (TypeError, ValueError):
                     continue
 
-                measurand = sample.get("measurand")
+                # OCPP 1.6: zonder measurand is het de energie-teller
+                measurand = sample.get("measurand") or "Energy.Active.Import.Register"
                 phase = sample.get("phase")
 
+                key = (measurand, phase)
+                if phase:
+                    phases.setdefault(measurand, set()).add(phase)
+                if key not in self.seen:
+                    self.seen.add(key)
+                    new_keys.append(key)
+
                 # Energie totaal
-                if measurand == "Energy.Active.Import.Register":
+                if measurand == "Energy.Active.Import.Register" and not phase:
                     if self.energy != value:
                         self.energy = value
                         updated = True
+                        if self.cost is not None:
+                            self.cost.add_energy(value)
 
                 # Vermogen per fase
                 elif measurand == "Power.Active.Import" and phase:
-                    self.phase_power[phase] = value
-                    updated = True
+                    if self.phase_power.get(phase) != value:
+                        self.phase_power[phase] = value
+                        updated = True
 
                 # Stroom per fase
                 elif measurand == "Current.Import" and phase:
-                    self.currents[phase] = value
-                    updated = True
+                    self.anomalies.add_current(phase, value)
+                    if self.currents.get(phase) != value:
+                        self.currents[phase] = value
+                        updated = True
 
                 # Spanning per fase
                 elif measurand == "Voltage" and phase:
-                    self.voltages[phase] = value
-                    updated = True
+                    self.anomalies.add_voltage(phase, value)
+                    if self.voltages.get(phase) != value:
+                        self.voltages[phase] = value
+                        updated = True
 
                 # Temperatuur
-                elif measurand == "Temperature":
+                elif measurand == "Temperature" and not phase:
+                    self.anomalies.add_temperature(value, _sample_time(entry))
                     if self.temperature != value:
                         self.temperature = value
                         updated = True
 
+                # Totaal vermogen zonder fase: alleen als er geen fases zijn
+                elif measurand == "Power.Active.Import":
+                    if not self.phase_power and self.power != value:
+                        self.power = value
+                        updated = True
+
+                # Alles wat we niet specifiek kennen (SoC, Frequency, ...)
+                else:
+                    self.measurand_units[key] = sample.get("unit")
+                    if self.measurands.get(key) != value:
+                        self.measurands[key] = value
+                        updated = True
+
         # Totaal vermogen = som fases
         if self.phase_power:
             total = sum(self.phase_power.values())
@@ -118,6 +196,45 @@ class GrowattCoordinator(DataUpdateCoordinator):
                 self.power = total
                 updated = True
 
+            total_key = ("Power.Active.Import", None)
+            if total_key not in self.seen:
+                self.seen.add(total_key)
+                new_keys.append(total_key)
+
+        # Eens per bericht, niet per sample: alle fases zijn dan bijgewerkt
+        for name in self.anomalies.evaluate():
+            updated = True
+            self.hass.bus.async_fire(
+                EVENT_ANOMALY,
+                {
+                    "charge_point": self.charge_point_id,
+                    "anomaly": name,
+                    "active": self.anomalies.is_active(name),
+                    "details": dict(self.anomalies.details[name]),
+                },
+            )
+
+        # Eerst de nieuwe entities laten aanmaken, dan pas de update sturen
+        for key in new_keys:
+            async_dispatcher_send(self.hass, SIGNAL_NEW_MEASURAND, key)
+
+        # Fase-onbalans pas als entity zodra twee fases stroom gevoerd hebben;
+        # bij een 1-fase THOR kan hij nooit aan
+        if not self.imbalance_announced and self.anomalies.imbalance_possible:
+            self.imbalance_announced = True
+            async_dispatcher_send(self.hass, SIGNAL_NEW_ANOMALY, PHASE_IMBALANCE)
+
+        # Eerste bericht met deze measurand: fases die ontbreken (bv. L2/L3
+        # uit de registry van een oudere versie) horen niet bij deze THOR
+        for measurand, present in phases.items():
+            if measurand in self.measurand_phases:
+                continue
+            self.measurand_phases[measurand] = frozenset(present)
+            for key in [k for k in self.seen if k[0] == measurand and k[1]]:
+                if key[1] not in present:
+                    self.seen.discard(key)
+                    async_dispatcher_send(self.hass, SIGNAL_STALE_MEASURAND, key)
+
         if updated:
             self.async_set_updated_data(True)
 
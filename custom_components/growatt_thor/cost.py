@@ -0,0 +1,171 @@
+"""
+Laadkosten op basis van een (dynamische of tijdsafhankelijke) prijs-entity.
+
+Iedere nieuwe stand van ``Energy.Active.Import.Register`` levert een delta
+in Wh op; die wordt tegen de prijs van dat moment opgeteld bij de sessie- en
+dagtotalen. Geen historie, geen herberekening: O(1) per sample.
+
+De totalen en de laatste meterstand worden bewaard, zodat een herstart van
+Home Assistant de sessie en de dag niet op nul zet.
+"""
+
+import logging
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, COST_STORAGE_VERSION, COST_SAVE_DELAY, COST_MAX_DELTA_WH
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CostEngine:
+    """Lopende kosten per sessie en per dag voor één THOR."""
+
+    def __init__(self, hass, price_entity):
+        self.hass = hass
+        self.price_entity = price_entity
+        self._store = Store(hass, COST_STORAGE_VERSION, f"{DOMAIN}.cost")
+
+        self.last_energy = None      # Wh, laatst verwerkte meterstand
+        self.session_cost = 0.0
+        self.session_energy = 0.0    # Wh
+        self.session_start = None    # datetime
+        self.today_cost = 0.0
+        self.day = None              # "YYYY-MM-DD", lokale tijd
+        self.day_start = None        # datetime
+        self.unpriced_energy = 0.0   # Wh in deze sessie geladen zonder geldige prijs
+
+        self._save_scheduled = False
+
+    async def async_load(self):
+        data = await self._store.async_load() or {}
+        self.last_energy = data.get("last_energy")
+        self.session_cost = data.get("session_cost", 0.0)
+        self.session_energy = data.get("session_energy", 0.0)
+        self.session_start = _parse(data.get("session_start"))
+        self.today_cost = data.get("today_cost", 0.0)
+        self.day = data.get("day")
+        self.day_start = _parse(data.get("day_start"))
+        self.unpriced_energy = data.get("unpriced_energy", 0.0)
+        self.roll_day()
+
+    async def async_remove(self):
+        """Integratie verwijderd: opgeslagen totalen weggooien."""
+        await self._store.async_remove()
+
+    # ─────────────────────────────
+    # Prijs
+    # ─────────────────────────────
+
+    @property
+    def currency(self):
+        """Valuta uit de unit van de prijs-entity (bv. EUR/kWh → EUR)."""
+        state = self.hass.states.get(self.price_entity)
+        if state is None:
+            return self.hass.config.currency
+        unit = state.attributes.get("unit_of_measurement") or ""
+        return unit.split("/")[0] or self.hass.config.currency
+
+    def price(self):
+        """Actuele prijs per kWh, of None als de entity geen geldige waarde heeft."""
+        state = self.hass.states.get(self.price_entity)
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return None
+        try:
+            return float(state.state)
+        except ValueError:
+            return None
+
+    # ─────────────────────────────
+    # Samples
+    # ─────────────────────────────
+
+    def add_energy(self, energy) -> bool:
+        """
+        Verwerk een nieuwe meterstand (Wh). Geeft True als de kosten
+        veranderd zijn.
+        """
+        last, self.last_energy = self.last_energy, energy
+        self._save()
+
+        if last is None:
+            return False
+
+        delta = energy - last
+        if delta <= 0:
+            return False
+        if delta > COST_MAX_DELTA_WH:
+            # Teller gereset of vervangen; dit is geen echte lading
+            _LOGGER.warning("Ignoring energy jump of %.0f Wh for cost", delta)
+            return False
+
+        self.roll_day()
+        self.session_energy += delta
+
+        price = self.price()
+        if price is None:
+            self.unpriced_energy += delta
+            _LOGGER.debug(
+                "No valid price from %s, %.0f Wh not costed", self.price_entity, delta
+            )
+            return False
+
+        cost = delta / 1000 * price
+        self.session_cost += cost
+        self.today_cost += cost
+        return True
+
+    def start_session(self):
+        self.session_cost = 0.0
+        self.session_energy = 0.0
+        self.unpriced_energy = 0.0
+        self.session_start = dt_util.utcnow()
+        self._save()
+
+    def roll_day(self) -> bool:
+        """Nieuwe (lokale) dag: dagtotaal op nul. True als er gerold is."""
+        now = dt_util.now()
+        today = now.date().isoformat()
+        if self.day == today:
+            return False
+
+        self.day = today
+        self.day_start = dt_util.start_of_local_day(now)
+        self.today_cost = 0.0
+        self._save()
+        return True
+
+    # ─────────────────────────────
+    # Opslag
+    # ─────────────────────────────
+
+    def _save(self):
+        # Niet bij iedere sample opnieuw plannen: async_delay_save schuift de
+        # timer steeds op, en bij frequente MeterValues zou er nooit
+        # geschreven worden
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data, COST_SAVE_DELAY)
+
+    def _data(self):
+        self._save_scheduled = False
+        return {
+            "last_energy": self.last_energy,
+            "session_cost": self.session_cost,
+            "session_energy": self.session_energy,
+            "session_start": _format(self.session_start),
+            "today_cost": self.today_cost,
+            "day": self.day,
+            "day_start": _format(self.day_start),
+            "unpriced_energy": self.unpriced_energy,
+        }
+
+
+def _parse(value):
+    return dt_util.parse_datetime(value) if value else None
+
+
+def _format(value):
+    return value.isoformat() if value else None
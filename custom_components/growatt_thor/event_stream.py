@@ -0,0 +1,339 @@
+"""
+Lokale event stream tussen de standalone gateway en Home Assistant.
+
+Protocol: één JSON object per regel (newline-delimited JSON).
+
+    {"role": "publisher"}     eerste regel van een gateway worker
+    {"role": "subscriber"}    eerste regel van Home Assistant
+
+Daarna stuurt een publisher events van de vorm
+
+    {"cp_id": "THOR1", "method": "process_meter_values", "args": [...]}
+
+en de hub zet die ongewijzigd door naar alle subscribers. ``method`` is
+altijd een van de coordinator-methodes in STREAM_METHODS.
+
+Deze module gebruikt alleen de standard library, zodat de gateway hem kan
+importeren zonder Home Assistant op te starten.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+
+_LOGGER = logging.getLogger(__name__)
+
+STREAM_METHODS = (
+    "set_charge_point",
+    "set_status",
+    "start_transaction",
+    "stop_transaction",
+    "process_meter_values",
+    "process_configuration",
+    "process_frozen_record",
+)
+
+ROLE_PUBLISHER = "publisher"
+ROLE_SUBSCRIBER = "subscriber"
+
+# Subscribers die zoveel bytes achterlopen worden afgesloten i.p.v. de
+# hub (en daarmee alle workers) te laten wachten
+MAX_SUBSCRIBER_BACKLOG = 1024 * 1024
+
+# Aantal events dat een publisher buffert zolang de hub weg is
+PUBLISHER_BUFFER = 1000
+
+RECONNECT_DELAY = 5
+
+
+def parse_address(value, default_port):
+    """
+    ``"host:port"`` (of alleen ``"host"``) naar ``(host, port)``.
+
+    ValueError als de host ontbreekt of de poort geen geldige poort is.
+    """
+    host, _, port = value.strip().partition(":")
+    if not host:
+        raise ValueError("missing host")
+    port = int(port) if port else default_port
+    if not 0 < port < 65536:
+        raise ValueError(f"port {port} out of range")
+    return host, port
+
+
+def encode_event(cp_id, method, args) -> bytes:
+    return (
+        json.dumps(
+            {"cp_id": cp_id, "method": method, "args": args},
+            separators=(",", ":"),
+            default=str,
+        )
+        + "\n"
+    ).encode()
+
+
+def _hello(role) -> bytes:
+    return (json.dumps({"role": role}) + "\n").encode()
+
+
+# ─────────────────────────────
+# Hub (draait in de gateway)
+# ─────────────────────────────
+
+class EventHub:
+    """Fan-out van publisher events naar alle subscribers."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._subscribers = set()
+        self._handlers = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port
+        )
+        _LOGGER.info("Event stream listening on %s:%s", self.host, self.port)
+
+    async def close(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._subscribers):
+            writer.close()
+        # Handlers laten aflopen, anders breekt asyncio.run ze af tijdens
+        # het afsluiten (met een traceback in de log)
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            await self._serve(reader, writer)
+        finally:
+            self._handlers.discard(task)
+
+    async def _serve(self, reader, writer):
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+        except ValueError:
+            hello = {}
+
+        role = hello.get("role")
+        peer = writer.get_extra_info("peername")
+
+        try:
+            if role == ROLE_SUBSCRIBER:
+                _LOGGER.info("Event stream subscriber connected: %s", peer)
+                self._subscribers.add(writer)
+                # Subscribers sturen niets; wachten tot ze weggaan
+                await reader.read()
+            elif role == ROLE_PUBLISHER:
+                _LOGGER.debug("Event stream publisher connected: %s", peer)
+                while line := await reader.readline():
+                    self._broadcast(line)
+            else:
+                _LOGGER.warning("Event stream: unknown role from %s", peer)
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+
+    def _broadcast(self, line):
+        for writer in list(self._subscribers):
+            if writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BACKLOG:
+                _LOGGER.warning("Dropping slow event stream subscriber")
+                self._subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+
+# ─────────────────────────────
+# Publisher (draait in iedere gateway worker)
+# ─────────────────────────────
+
+class EventStreamPublisher:
+    """Houdt een verbinding met de hub open en stuurt events door."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._buffer = deque(maxlen=PUBLISHER_BUFFER)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def publish(self, cp_id, method, args):
+        self._buffer.append(encode_event(cp_id, method, args))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as exc:
+                _LOGGER.warning("Event hub not reachable (%s), retrying", exc)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            try:
+                writer.write(_hello(ROLE_PUBLISHER))
+                while True:
+                    # Eerst clearen: een publish() tijdens drain() moet de
+                    # volgende wait() meteen laten doorlopen
+                    self._wakeup.clear()
+                    while self._buffer:
+                        writer.write(self._buffer.popleft())
+                    await writer.drain()
+                    await self._wakeup.wait()
+            except ConnectionError as exc:
+                _LOGGER.warning("Event hub connection lost (%s)", exc)
+            finally:
+                writer.close()
+
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+class EventStreamCoordinator:
+    """
+    Coordinator-vervanger voor de gateway.
+
+    Biedt dezelfde methodes die GrowattChargePoint op de coordinator
+    aanroept, maar zet ze als event door naar de hub. Eén instantie per
+    verbinding, zodat ieder event het juiste cp_id draagt.
+    """
+
+    def __init__(self, publisher):
+        self._publisher = publisher
+        self.charge_point_id = None
+
+    def now(self) -> str:
+        return datetime.utcnow().isoformat() + "Z"
+
+    def set_charge_point(self, cp_id):
+        self.charge_point_id = cp_id
+        self._publish("set_charge_point", cp_id)
+
+    def set_status(self, status):
+        value = status.value if hasattr(status, "value") else str(status)
+        self._publish("set_status", value)
+
+    def start_transaction(self, transaction_id, id_tag=None):
+        self._publish("start_transaction", transaction_id, id_tag)
+
+    def stop_transaction(self, reason=None):
+        self._publish("stop_transaction", reason)
+
+    def process_meter_values(self, meter_values):
+        self._publish("process_meter_values", meter_values)
+
+    def process_configuration(self, configuration: list):
+        self._publish("process_configuration", configuration)
+
+    def process_frozen_record(self, data: dict):
+        self._publish("process_frozen_record", data)
+
+    def _publish(self, method, *args):
+        self._publisher.publish(self.charge_point_id, method, list(args))
+
+
+# ─────────────────────────────
+# Subscriber (draait in Home Assistant)
+# ─────────────────────────────
+
+def decode_event(line):
+    """Eén event-regel naar een dict, of None bij een ongeldige regel."""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        _LOGGER.warning("Ignoring malformed event stream line: %r", line)
+        return None
+    return event if isinstance(event, dict) else None
+
+
+def apply_event(coordinator, event) -> bool:
+    """Pas één event toe op een (Home Assistant) coordinator."""
+    method = event.get("method")
+    if method not in STREAM_METHODS:
+        _LOGGER.debug("Ignoring unknown event stream method: %s", method)
+        return False
+
+    try:
+        getattr(coordinator, method)(*event.get("args", []))
+    except Exception:
+        _LOGGER.exception("Failed to apply event stream %s", method)
+        return False
+    return True
+
+
+async def follow_event_stream(host, port, coordinator, charge_point_id=None):
+    """
+    Volg de event stream van een gateway en voed de coordinator.
+
+    De coordinator hoort bij één THOR: ``charge_point_id`` als die is
+    ingesteld, anders de THOR die de coordinator al kent of de eerste
+    waarvan een event binnenkomt. Events van andere THORs worden genegeerd,
+    met één waarschuwing per id.
+
+    Blijft (met reconnect) draaien tot de task gecanceld wordt.
+    """
+    selected = charge_point_id or coordinator.charge_point_id
+    ignored = set()
+
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as exc:
+            _LOGGER.warning(
+                "Growatt THOR gateway %s:%s not reachable (%s)", host, port, exc
+            )
+            await asyncio.sleep(RECONNECT_DELAY)
+            continue
+
+        _LOGGER.info("Following Growatt THOR gateway on %s:%s", host, port)
+
+        try:
+            writer.write(_hello(ROLE_SUBSCRIBER))
+            await writer.drain()
+            while line := await reader.readline():
+                event = decode_event(line)
+                if event is None:
+                    continue
+
+                cp_id = event.get("cp_id")
+                if selected is None and cp_id:
+                    selected = cp_id
+                    _LOGGER.info("Growatt THOR following charge point %s", cp_id)
+
+                if cp_id != selected:
+                    if cp_id not in ignored:
+                        ignored.add(cp_id)
+                        _LOGGER.warning(
+                            "Ignoring gateway events from charge point %s, "
+                            "this integration follows %s (see the charge "
+                            "point id option)",
+                            cp_id,
+                            selected,
+                        )
+                    continue
+
+                apply_event(coordinator, event)
+        except ConnectionError as exc:
+            _LOGGER.warning("Growatt THOR gateway connection lost (%s)", exc)
+        finally:
+            writer.close()
+
+        coordinator.set_status("Unavailable")
+        await asyncio.sleep(RECONNECT_DELAY)
@@ -0,0 +1,187 @@
+"""
+Standalone Growatt THOR OCPP gateway.
+
+Draait dezelfde GrowattChargePoint handlers als de integratie, maar buiten
+de Home Assistant event loop. Home Assistant volgt de gateway via de lokale
+event stream (zie event_stream.py en de ``event_stream`` optie).
+
+    python -m custom_components.growatt_thor.gateway --port 9000 --workers 4
+
+Met ``--workers`` > 1 luisteren meerdere processen op dezelfde poort
+(SO_REUSEPORT, alleen Linux/BSD); het hoofdproces draait dan de event hub.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+import socket
+
+from .const import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_EVENT_HOST,
+    DEFAULT_EVENT_PORT,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_CONNECTIONS_PER_IP,
+    DEFAULT_VALIDATION_POLICY,
+    DEFAULT_VALIDATION_SAMPLE_RATE,
+)
+from .event_stream import EventHub, EventStreamCoordinator, EventStreamPublisher
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_components.growatt_thor.gateway",
+        description="Headless OCPP gateway for Growatt THOR chargers",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--event-host", default=DEFAULT_EVENT_HOST)
+    parser.add_argument("--event-port", type=int, default=DEFAULT_EVENT_PORT)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=DEFAULT_MAX_CONNECTIONS,
+        help="per worker",
+    )
+    parser.add_argument(
+        "--max-connections-per-ip",
+        type=int,
+        default=DEFAULT_MAX_CONNECTIONS_PER_IP,
+        help="per worker",
+    )
+    parser.add_argument(
+        "--validate",
+        action="append",
+        default=[],
+        metavar="ACTION=MODE",
+        help="schema validation per action: full, sampled or off",
+    )
+    parser.add_argument(
+        "--uvloop", action="store_true", help="use uvloop when installed"
+    )
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
+def _install_event_loop_policy(use_uvloop):
+    if not use_uvloop:
+        return
+    try:
+        import uvloop
+    except ImportError:
+        _LOGGER.warning("uvloop requested but not installed, using asyncio")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+async def _wait_for_shutdown():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+async def _serve_ocpp(args, reuse_port):
+    # Pas hier importeren: het hoofdproces van een multi-worker gateway
+    # heeft de ocpp library niet nodig
+    from .codec import OcppCodec, parse_policy
+    from .connection_manager import ConnectionManager
+    from .ocpp_server import start_ocpp_server
+
+    policy = {**DEFAULT_VALIDATION_POLICY, **parse_policy(args.validate)}
+
+    publisher = EventStreamPublisher(args.event_host, args.event_port)
+    publisher.start()
+
+    manager = await start_ocpp_server(
+        host=args.host,
+        port=args.port,
+        coordinator_factory=lambda: EventStreamCoordinator(publisher),
+        manager=ConnectionManager(
+            max_connections=args.max_connections,
+            max_connections_per_ip=args.max_connections_per_ip,
+        ),
+        codec=OcppCodec(policy, sample_rate=DEFAULT_VALIDATION_SAMPLE_RATE),
+        reuse_port=reuse_port,
+    )
+    return manager, publisher
+
+
+async def _run_single(args):
+    hub = EventHub(args.event_host, args.event_port)
+    await hub.start()
+    manager, publisher = await _serve_ocpp(args, reuse_port=False)
+
+    try:
+        await _wait_for_shutdown()
+    finally:
+        await manager.async_close()
+        await publisher.close()
+        await hub.close()
+
+
+async def _run_worker_async(args):
+    manager, publisher = await _serve_ocpp(args, reuse_port=True)
+    try:
+        await _wait_for_shutdown()
+    finally:
+        await manager.async_close()
+        await publisher.close()
+
+
+def _run_worker(args):
+    logging.basicConfig(level=args.log_level.upper())
+    _install_event_loop_policy(args.uvloop)
+    asyncio.run(_run_worker_async(args))
+
+
+async def _run_supervisor(args):
+    hub = EventHub(args.event_host, args.event_port)
+    await hub.start()
+
+    ctx = multiprocessing.get_context("spawn")
+    workers = [
+        ctx.Process(target=_run_worker, args=(args,), name=f"thor-ocpp-{i}")
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    _LOGGER.info("Started %d OCPP workers on port %s", len(workers), args.port)
+
+    try:
+        await _wait_for_shutdown()
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            await asyncio.get_running_loop().run_in_executor(
+                None, worker.join, 10
+            )
+        await hub.close()
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        _LOGGER.warning("SO_REUSEPORT not supported here, using 1 worker")
+        args.workers = 1
+
+    _install_event_loop_policy(args.uvloop)
+
+    if args.workers > 1:
+        asyncio.run(_run_supervisor(args))
+    else:
+        asyncio.run(_run_single(args))
+
+
+if __name__ == "__main__":
+    main()
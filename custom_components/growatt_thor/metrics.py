@@ -0,0 +1,196 @@
+"""
+Prometheus metrics endpoint naast de OCPP server.
+
+De tekst wordt periodiek (``interval``) in een snapshot opgebouwd; een
+scrape stuurt alleen die bytes terug en raakt de coordinator dus nooit.
+"""
+
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request line + headers van een scrape; wat langer duurt of groter is, is
+# geen Prometheus
+REQUEST_TIMEOUT = 5
+MAX_REQUEST_SIZE = 8192
+
+# (naam, type, help, coordinator attribuut)
+CHARGER_GAUGES = (
+    ("growatt_thor_power_watts", "gauge", "Total charging power", "power"),
+    (
+        "growatt_thor_energy_import_wh_total",
+        "counter",
+        "Energy.Active.Import.Register",
+        "energy",
+    ),
+    ("growatt_thor_temperature_celsius", "gauge", "Charger temperature", "temperature"),
+    ("growatt_thor_max_current_amperes", "gauge", "G_MaxCurrent", "max_current"),
+)
+
+# (naam, help, coordinator attribuut {fase: waarde})
+PHASE_GAUGES = (
+    ("growatt_thor_phase_current_amperes", "Current per phase", "currents"),
+    ("growatt_thor_phase_voltage_volts", "Voltage per phase", "voltages"),
+    ("growatt_thor_phase_power_watts", "Power per phase", "phase_power"),
+)
+
+
+def _escape(value) -> str:
+    return (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def render(coordinators, manager=None) -> str:
+    """Bouw de Prometheus tekst op uit coordinators en de ConnectionManager."""
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for name, kind, help_text, attr in CHARGER_GAUGES:
+        header(name, kind, help_text)
+        for coordinator in coordinators:
+            value = getattr(coordinator, attr, None)
+            if value is not None:
+                labels = _labels(charge_point=coordinator.charge_point_id or "")
+                lines.append(f"{name}{{{labels}}} {float(value)}")
+
+    for name, help_text, attr in PHASE_GAUGES:
+        header(name, "gauge", help_text)
+        for coordinator in coordinators:
+            for phase, value in sorted(getattr(coordinator, attr, {}).items()):
+                labels = _labels(
+                    charge_point=coordinator.charge_point_id or "", phase=phase
+                )
+                lines.append(f"{name}{{{labels}}} {float(value)}")
+
+    header("growatt_thor_status", "gauge", "Current OCPP status (1 = active)")
+    for coordinator in coordinators:
+        if coordinator.status is not None:
+            labels = _labels(
+                charge_point=coordinator.charge_point_id or "",
+                status=coordinator.status,
+            )
+            lines.append(f"growatt_thor_status{{{labels}}} 1")
+
+    if manager is not None:
+        header("growatt_thor_connections", "gauge", "OCPP websocket connections")
+        states = {}
+        for session in manager.sessions:
+            states[session.state] = states.get(session.state, 0) + 1
+        for state, count in sorted(states.items()):
+            lines.append(f"growatt_thor_connections{{{_labels(state=state)}}} {count}")
+
+        header(
+            "growatt_thor_connections_rejected_total",
+            "counter",
+            "Connections rejected by connection limits",
+        )
+        lines.append(f"growatt_thor_connections_rejected_total {manager.rejected}")
+
+        header("growatt_thor_messages_total", "counter", "OCPP messages")
+        for (direction, action), count in sorted(manager.message_counts().items()):
+            labels = _labels(direction=direction, action=action)
+            lines.append(f"growatt_thor_messages_total{{{labels}}} {count}")
+
+    header("growatt_thor_snapshot_timestamp_seconds", "gauge", "Snapshot time")
+    lines.append(f"growatt_thor_snapshot_timestamp_seconds {time.time():.3f}")
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Kleine HTTP server voor ``GET /metrics``.
+
+    ``get_coordinators`` en ``get_manager`` zijn callables, zodat de exporter
+    kan starten voordat de OCPP server draait (zie _async_start_transport).
+    """
+
+    def __init__(self, host, port, get_coordinators, get_manager, interval=10):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self._get_coordinators = get_coordinators
+        self._get_manager = get_manager
+        self._snapshot = b""
+        self._server = None
+        self._refresher = None
+
+    async def start(self):
+        self.refresh()
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=MAX_REQUEST_SIZE
+        )
+        self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+        _LOGGER.info("Growatt THOR metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def refresh(self):
+        try:
+            text = render(self._get_coordinators(), self._get_manager())
+        except Exception:
+            _LOGGER.exception("Failed to build metrics snapshot")
+            return
+        self._snapshot = text.encode()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.refresh()
+
+    @staticmethod
+    async def _read_request(reader):
+        """Request line teruggeven; de headers lezen en negeren."""
+        request = await reader.readline()
+        size = len(request)
+        while True:
+            line = await reader.readline()
+            size += len(line)
+            if size > MAX_REQUEST_SIZE:
+                raise ValueError("Request too large")
+            if line in (b"\r\n", b"\n", b""):
+                return request
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(
+                self._read_request(reader), timeout=REQUEST_TIMEOUT
+            )
+
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1] in (b"/metrics", b"/"):
+                status, body = "200 OK", self._snapshot
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+
+            writer.write(
+                (
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: {CONTENT_TYPE}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
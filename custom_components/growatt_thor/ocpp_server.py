@@ -1,5 +1,9 @@
+import asyncio
 import logging
+import time
+from collections import Counter
 from urllib.parse import parse_qs
+from websockets.exceptions import ConnectionClosed
 from websockets.server import serve
 
 from ocpp.v16 import ChargePoint as OcppChargePoint
@@ -9,9 +13,19 @@ from ocpp.v16.enums import (
     AuthorizationStatus,
     DataTransferStatus,
 )
+from ocpp.exceptions import OCPPError
+from ocpp.messages import MessageType
 from ocpp.routing import on
 
-from .const import OCPP_SUBPROTOCOL, DEFAULT_PATH, DOMAIN
+from .codec import OcppCodec
+from .connection_manager import ConnectionManager
+from .const import (
+    OCPP_SUBPROTOCOL,
+    DEFAULT_PATH,
+    DOMAIN,
+    DEFAULT_VALIDATION_POLICY,
+    DEFAULT_VALIDATION_SAMPLE_RATE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,21 +33,116 @@ _LOGGER = logging.getLogger(__name__)
 class GrowattChargePoint(OcppChargePoint):
     """
     Growatt THOR OCPP 1.6 Charge Point
+
+    ``hass`` is optional: the standalone gateway (gateway.py) runs the same
+    handlers without Home Assistant and passes ``None``.
     """
 
-    def __init__(self, cp_id, websocket, coordinator, hass):
+    def __init__(self, cp_id, websocket, coordinator, hass=None, codec=None):
         super().__init__(cp_id, websocket)
 
         self.coordinator = coordinator
         self.hass = hass
+        self.codec = codec or OcppCodec(
+            DEFAULT_VALIDATION_POLICY, sample_rate=DEFAULT_VALIDATION_SAMPLE_RATE
+        )
         self._transaction_id = 1
+        self._tasks = set()
+
+        # Voor de ConnectionManager: idle-detectie en draining
+        self.last_message = None
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # Berichten per (richting, action), voor de metrics endpoint
+        self.counters = Counter()
 
-        hass.data.setdefault(DOMAIN, {})
-        hass.data[DOMAIN]["charge_point"] = self
+        if hass is not None:
+            hass.data.setdefault(DOMAIN, {})
+            hass.data[DOMAIN]["charge_point"] = self
 
         self.coordinator.set_charge_point(cp_id)
         _LOGGER.info("GrowattChargePoint initialised for %s", cp_id)
 
+    def _create_task(self, coro):
+        if self.hass is not None:
+            return self.hass.async_create_task(coro)
+
+        # Zonder HA: zelf een referentie houden, anders kan de task
+        # halverwege door de garbage collector opgeruimd worden
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ─────────────────────────────
+    # Lopende CALLs bijhouden
+    # ─────────────────────────────
+
+    async def route_message(self, raw_msg):
+        self.last_message = time.monotonic()
+        self._begin()
+        try:
+            await self._route(raw_msg)
+        finally:
+            self._end()
+
+    async def _route(self, raw_msg):
+        """
+        Zelfde routing als de ocpp library, maar via onze codec: snellere
+        JSON decoder en schema-validatie volgens het beleid per action.
+        """
+        try:
+            msg = self.codec.unpack(raw_msg)
+        except OCPPError as exc:
+            _LOGGER.warning("Unable to parse OCPP message %r: %s", raw_msg, exc)
+            self.counters[("in", "invalid")] += 1
+            return
+
+        if msg.message_type_id == MessageType.Call:
+            handlers = self.route_map.get(msg.action)
+            # Action komt van de charger: onbekende onder één label, anders
+            # groeit het aantal metric series onbeperkt
+            self.counters[("in", msg.action if handlers is not None else "unknown")] += 1
+            if handlers is not None:
+                # Berichten worden per verbinding na elkaar afgehandeld, dus
+                # de vlag zetten vlak voor _handle_call is veilig
+                handlers["_skip_schema_validation"] = not self.codec.should_validate(
+                    msg.action
+                )
+            try:
+                await self._handle_call(msg)
+            except OCPPError as error:
+                _LOGGER.exception("Error while handling request '%s'", msg)
+                await self._send(msg.create_call_error(error).to_json())
+
+        elif msg.message_type_id in (MessageType.CallResult, MessageType.CallError):
+            self.counters[("in", type(msg).__name__)] += 1
+            self._response_queue.put_nowait(msg)
+
+    async def call(self, payload, *args, **kwargs):
+        # Nieuwere ocpp versies kennen ook payload classes zonder "Payload"
+        self.counters[("out", type(payload).__name__.removesuffix("Payload"))] += 1
+        self._begin()
+        try:
+            return await super().call(payload, *args, **kwargs)
+        finally:
+            self._end()
+
+    async def wait_idle(self):
+        """Wacht tot er geen inkomende of uitgaande CALL meer loopt."""
+        await self._idle.wait()
+
+    def _begin(self):
+        self._pending += 1
+        self._idle.clear()
+
+    def _end(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+
     # ─────────────────────────────
     # Boot / keepalive
     # ─────────────────────────────
@@ -42,8 +151,8 @@ class GrowattChargePoint(OcppChargePoint):
     async def on_boot_notification(self, **payload):
         _LOGGER.info("BootNotification payload: %s", payload)
 
-        # 🔑 NA succesvolle boot: automatisch config ophalen
-        self.hass.async_create_task(self.trigger_get_configuration())
+        # 🔑 NA succesvolle boot: wachtrij versturen en config ophalen
+        self._create_task(self._after_boot())
 
         return call_result.BootNotificationPayload(
             current_time=self.coordinator.now(),
@@ -51,6 +160,17 @@ class GrowattChargePoint(OcppChargePoint):
             status=RegistrationStatus.accepted,
         )
 
+    async def _after_boot(self):
+        # Eerst de commando's die klaarstonden terwijl de THOR offline was,
+        # dan de configuratie ophalen (zodat die de nieuwe waarden toont)
+        commands = None
+        if self.hass is not None:
+            commands = self.hass.data.get(DOMAIN, {}).get("commands")
+        if commands is not None:
+            await commands.async_flush(self)
+
+        await self.trigger_get_configuration()
+
     @on("Heartbeat")
     async def on_heartbeat(self, **payload):
         return call_result.HeartbeatPayload(
@@ -137,6 +257,29 @@ class GrowattChargePoint(OcppChargePoint):
             )
         )
 
+    async def refresh(self):
+        """
+        Status, Growatt meter values en configuratie opvragen.
+        Exact volgorde zoals Growatt cloud.
+        """
+        await self.trigger_status()
+        await self.trigger_external_meterval()
+        await self.trigger_get_configuration()
+
+    async def change_configuration(self, key, value):
+        """ChangeConfiguration; geeft de status van de THOR terug."""
+        _LOGGER.info("Changing configuration %s = %s", key, value)
+
+        result = await self.call(
+            call.ChangeConfigurationPayload(key=key, value=str(value))
+        )
+
+        # CALLError (bv. onbekende key): de THOR heeft geweigerd
+        if result is None:
+            return "CallError"
+        status = result.status
+        return status.value if hasattr(status, "value") else str(status)
+
     async def trigger_get_configuration(self):
         """
         Haalt volledige Growatt configuratie op en zet deze door naar de coordinator
@@ -166,33 +309,104 @@ class GrowattChargePoint(OcppChargePoint):
             )
 
 
+def supported_actions():
+    """Alle OCPP actions waarvoor GrowattChargePoint een handler heeft."""
+    return [
+        attr._on_action
+        for attr in vars(GrowattChargePoint).values()
+        if hasattr(attr, "_on_action")
+    ]
+
+
 # ─────────────────────────────
 # WebSocket server
 # ─────────────────────────────
 
-async def _on_connect(websocket, path, coordinator, hass):
+async def _on_connect(
+    websocket, path, coordinator, manager, hass=None, codec=None
+):
     if not path.startswith(DEFAULT_PATH):
         await websocket.close()
         return
 
     cp_id = path.rstrip("/").split("/")[-1]
-    _LOGGER.info("THOR connected: %s", cp_id)
 
-    cp = GrowattChargePoint(cp_id, websocket, coordinator, hass)
+    session = manager.admit(cp_id, websocket)
+    if session is None:
+        await manager.reject(websocket)
+        return
+
+    _LOGGER.info("THOR connected: %s (%s)", cp_id, session.remote_ip)
+
+    cp = GrowattChargePoint(cp_id, websocket, coordinator, hass, codec)
+    session.charge_point = cp
 
     try:
         await cp.start()
+    except ConnectionClosed as exc:
+        _LOGGER.info("THOR disconnected: %s (%s)", cp_id, exc)
     finally:
-        hass.data.get(DOMAIN, {}).pop("charge_point", None)
-        coordinator.set_status("Unavailable")
-
+        manager.release(session)
+
+        # Vervangen door een nieuwere verbinding van dezelfde THOR: die
+        # niet als Unavailable markeren
+        if not session.superseded:
+            if hass is not None:
+                hass.data.get(DOMAIN, {}).pop("charge_point", None)
+            coordinator.set_status("Unavailable")
+
+
+async def start_ocpp_server(
+    host,
+    port,
+    coordinator=None,
+    hass=None,
+    coordinator_factory=None,
+    manager=None,
+    codec=None,
+    warm_up=True,
+    **kwargs,
+):
+    """
+    Start de OCPP websocket server en geef de ConnectionManager terug.
 
-async def start_ocpp_server(host, port, coordinator, hass):
+    De gateway geeft ``coordinator_factory`` mee: dan krijgt iedere verbinding
+    een eigen coordinator. Met ``warm_up=False`` heeft de aanroeper de
+    validators al geladen (Home Assistant meet dat als aparte stap). Extra
+    kwargs (bv. ``reuse_port``) gaan door naar ``serve``. Afsluiten via
+    ``await manager.async_close()``.
+    """
     _LOGGER.info("Starting OCPP server on %s:%s", host, port)
-    return await serve(
-        lambda ws, path: _on_connect(ws, path, coordinator, hass),
+
+    if manager is None:
+        manager = ConnectionManager()
+
+    if codec is None:
+        codec = OcppCodec(
+            DEFAULT_VALIDATION_POLICY, sample_rate=DEFAULT_VALIDATION_SAMPLE_RATE
+        )
+
+    # Schema's van disk lezen is blocking I/O
+    if warm_up:
+        await asyncio.get_running_loop().run_in_executor(
+            None, codec.warm_up, supported_actions()
+        )
+
+    def _coordinator_for_connection():
+        if coordinator_factory is not None:
+            return coordinator_factory()
+        return coordinator
+
+    server = await serve(
+        lambda ws, path: _on_connect(
+            ws, path, _coordinator_for_connection(), manager, hass, codec
+        ),
         host,
         port,
         subprotocols=[OCPP_SUBPROTOCOL],
+        ping_interval=manager.ping_interval,
+        ping_timeout=manager.ping_timeout,
+        **kwargs,
     )
-
+    manager.attach(server)
+    return manager
@@ -5,8 +5,13 @@ from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorStateClass,
 )
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.const import (
+    PERCENTAGE,
+    UnitOfFrequency,
     UnitOfPower,
     UnitOfEnergy,
     UnitOfElectricCurrent,
@@ -14,37 +19,164 @@ from homeassistant.const import (
     UnitOfTemperature,
 )
 
-from .const import DOMAIN
+from .const import DOMAIN, SIGNAL_NEW_MEASURAND, SIGNAL_STALE_MEASURAND
+
+# Bekende niet-standaard measurands: (unit, device class)
+MEASURAND_SENSORS = {
+    "SoC": (PERCENTAGE, SensorDeviceClass.BATTERY),
+    "Frequency": (UnitOfFrequency.HERTZ, SensorDeviceClass.FREQUENCY),
+    "Current.Offered": (UnitOfElectricCurrent.AMPERE, SensorDeviceClass.CURRENT),
+    "Current.Export": (UnitOfElectricCurrent.AMPERE, SensorDeviceClass.CURRENT),
+    "Power.Offered": (UnitOfPower.WATT, SensorDeviceClass.POWER),
+    "Power.Active.Export": (UnitOfPower.WATT, SensorDeviceClass.POWER),
+    "Power.Factor": (None, SensorDeviceClass.POWER_FACTOR),
+}
+
+# OCPP 1.6 measurands en fases, om registry unique ids terug te vertalen
+OCPP_MEASURANDS = (
+    "Current.Export",
+    "Current.Import",
+    "Current.Offered",
+    "Energy.Active.Export.Register",
+    "Energy.Active.Import.Register",
+    "Energy.Reactive.Export.Register",
+    "Energy.Reactive.Import.Register",
+    "Energy.Active.Export.Interval",
+    "Energy.Active.Import.Interval",
+    "Energy.Reactive.Export.Interval",
+    "Energy.Reactive.Import.Interval",
+    "Frequency",
+    "Power.Active.Export",
+    "Power.Active.Import",
+    "Power.Factor",
+    "Power.Offered",
+    "Power.Reactive.Export",
+    "Power.Reactive.Import",
+    "RPM",
+    "SoC",
+    "Temperature",
+    "Voltage",
+)
+OCPP_PHASES = (
+    "L1", "L2", "L3", "N", "L1-N", "L2-N", "L3-N", "L1-L2", "L2-L3", "L3-L1",
+)
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = hass.data[DOMAIN]["coordinator"]
 
-    async_add_entities(
-        [
-            # ── Status / totaal ─────────────────────────
-            StatusSensor(coordinator, entry),
-            ChargingPowerSensor(coordinator, entry),
-            EnergyChargedSensor(coordinator, entry),
+    # Alleen Status staat altijd vast; de rest komt pas als de THOR de
+    # measurand (en fase) daadwerkelijk stuurt. Een 1-fase THOR krijgt zo
+    # geen permanent lege L2/L3 sensoren.
+    entities = [StatusSensor(coordinator, entry)]
+
+    # Na een herstart: measurands uit de registry van deze entry, zodat de
+    # entities meteen terug zijn i.p.v. te wachten op de eerste MeterValues
+    registry = er.async_get(hass)
+    _seed_from_registry(registry, coordinator, entry)
+
+    # Bij een reload kent de coordinator de measurands al
+    for key in sorted(coordinator.seen, key=str):
+        entities.append(_entity_for(coordinator, entry, key))
+
+    # Kosten alleen met een geconfigureerde prijs-entity
+    if coordinator.cost is not None:
+        entities += [
+            SessionCostSensor(coordinator, entry),
+            TodayCostSensor(coordinator, entry),
+        ]
 
-            # ── Fase-specifiek ─────────────────────────
-            CurrentSensor(coordinator, entry, "L1"),
-            CurrentSensor(coordinator, entry, "L2"),
-            CurrentSensor(coordinator, entry, "L3"),
+    async_add_entities(entities)
 
-            VoltageSensor(coordinator, entry, "L1"),
-            VoltageSensor(coordinator, entry, "L2"),
-            VoltageSensor(coordinator, entry, "L3"),
+    @callback
+    def _async_new_measurand(key):
+        async_add_entities([_entity_for(coordinator, entry, key)])
 
-            PhasePowerSensor(coordinator, entry, "L1"),
-            PhasePowerSensor(coordinator, entry, "L2"),
-            PhasePowerSensor(coordinator, entry, "L3"),
+    @callback
+    def _async_stale_measurand(key):
+        entity_id = registry.async_get_entity_id(
+            "sensor", DOMAIN, f"{entry.entry_id}_{_entity_key(*key)}"
+        )
+        if entity_id:
+            registry.async_remove(entity_id)
 
-            TemperatureSensor(coordinator, entry),
-        ]
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_NEW_MEASURAND, _async_new_measurand)
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_STALE_MEASURAND, _async_stale_measurand)
     )
 
 
+def _seed_from_registry(registry, coordinator, entry):
+    prefix = f"{entry.entry_id}_"
+
+    for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+        if registry_entry.domain != "sensor":
+            continue
+        key = ENTITY_KEYS.get(registry_entry.unique_id.removeprefix(prefix))
+        if key is None:
+            continue
+
+        # Fase die deze THOR niet heeft (bv. L2/L3 die oudere versies altijd
+        # aanmaakten): opruimen. Weet de coordinator het nog niet, dan gebeurt
+        # dat bij de eerste MeterValues (SIGNAL_STALE_MEASURAND).
+        measurand, phase = key
+        present = coordinator.measurand_phases.get(measurand)
+        if phase and present is not None and phase not in present:
+            registry.async_remove(registry_entry.entity_id)
+            continue
+
+        coordinator.seen.add(key)
+
+
+def _entity_for(coordinator, entry, key):
+    measurand, phase = key
+
+    if measurand == "Energy.Active.Import.Register" and not phase:
+        return EnergyChargedSensor(coordinator, entry)
+    if measurand == "Power.Active.Import":
+        if phase:
+            return PhasePowerSensor(coordinator, entry, phase)
+        return ChargingPowerSensor(coordinator, entry)
+    if measurand == "Current.Import" and phase:
+        return CurrentSensor(coordinator, entry, phase)
+    if measurand == "Voltage" and phase:
+        return VoltageSensor(coordinator, entry, phase)
+    if measurand == "Temperature" and not phase:
+        return TemperatureSensor(coordinator, entry)
+    return MeasurandSensor(coordinator, entry, measurand, phase)
+
+
+def _entity_key(measurand, phase):
+    """Unique id suffix; dezelfde keys als de entity classes hieronder."""
+    if measurand == "Energy.Active.Import.Register" and not phase:
+        return "energy_charged"
+    if measurand == "Power.Active.Import":
+        return f"power_{_slug(phase)}" if phase else "charging_power"
+    if measurand == "Current.Import" and phase:
+        return f"current_{_slug(phase)}"
+    if measurand == "Voltage" and phase:
+        return f"voltage_{_slug(phase)}"
+    if measurand == "Temperature" and not phase:
+        return "temperature"
+    if phase:
+        return f"{_slug(measurand)}_{_slug(phase)}"
+    return _slug(measurand)
+
+
+def _slug(text):
+    return text.lower().replace(".", "_").replace("-", "_")
+
+
+# Unique id suffix → (measurand, phase)
+ENTITY_KEYS = {
+    _entity_key(measurand, phase): (measurand, phase)
+    for measurand in OCPP_MEASURANDS
+    for phase in (None, *OCPP_PHASES)
+}
+
+
 # ─────────────────────────────
 # Base
 # ─────────────────────────────
@@ -129,7 +261,7 @@ class CurrentSensor(BaseSensor):
     def __init__(self, coordinator, entry, phase):
         self.phase = phase
         self._attr_name = f"Current {phase}"
-        super().__init__(coordinator, entry, f"current_{phase.lower()}")
+        super().__init__(coordinator, entry, f"current_{_slug(phase)}")
 
     @property
     def native_value(self):
@@ -148,7 +280,7 @@ class VoltageSensor(BaseSensor):
     def __init__(self, coordinator, entry, phase):
         self.phase = phase
         self._attr_name = f"Voltage {phase}"
-        super().__init__(coordinator, entry, f"voltage_{phase.lower()}")
+        super().__init__(coordinator, entry, f"voltage_{_slug(phase)}")
 
     @property
     def native_value(self):
@@ -167,7 +299,7 @@ class PhasePowerSensor(BaseSensor):
     def __init__(self, coordinator, entry, phase):
         self.phase = phase
         self._attr_name = f"Power {phase}"
-        super().__init__(coordinator, entry, f"power_{phase.lower()}")
+        super().__init__(coordinator, entry, f"power_{_slug(phase)}")
 
     @property
     def native_value(self):
@@ -191,3 +323,88 @@ class TemperatureSensor(BaseSensor):
     def native_value(self):
         return self.coordinator.temperature
 
+
+# ─────────────────────────────
+# Overige measurands (SoC, Frequency, ...)
+# ─────────────────────────────
+
+class MeasurandSensor(BaseSensor):
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator, entry, measurand, phase=None):
+        self.key = (measurand, phase)
+
+        unit, device_class = MEASURAND_SENSORS.get(measurand, (None, None))
+        if unit is None:
+            unit = coordinator.measurand_units.get(self.key)
+        self._attr_unit_of_measurement = unit
+        self._attr_device_class = device_class
+
+        if phase:
+            self._attr_name = f"{measurand} {phase}"
+            key = f"{_slug(measurand)}_{_slug(phase)}"
+        else:
+            self._attr_name = measurand
+            key = _slug(measurand)
+        super().__init__(coordinator, entry, key)
+
+    @property
+    def native_value(self):
+        return self.coordinator.measurands.get(self.key)
+
+
+# ─────────────────────────────
+# Kosten (cost.py)
+# ─────────────────────────────
+
+class SessionCostSensor(BaseSensor):
+    _attr_name = "Session Cost"
+    _attr_icon = "mdi:cash"
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+
+    def __init__(self, coordinator, entry):
+        super().__init__(coordinator, entry, "session_cost")
+
+    @property
+    def native_unit_of_measurement(self):
+        return self.coordinator.cost.currency
+
+    @property
+    def last_reset(self):
+        return self.coordinator.cost.session_start
+
+    @property
+    def native_value(self):
+        return round(self.coordinator.cost.session_cost, 2)
+
+    @property
+    def extra_state_attributes(self):
+        cost = self.coordinator.cost
+        return {
+            "energy_kwh": round(cost.session_energy / 1000, 3),
+            "unpriced_energy_kwh": round(cost.unpriced_energy / 1000, 3),
+            "price_entity": cost.price_entity,
+        }
+
+
+class TodayCostSensor(BaseSensor):
+    _attr_name = "Cost Today"
+    _attr_icon = "mdi:cash-clock"
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+
+    def __init__(self, coordinator, entry):
+        super().__init__(coordinator, entry, "cost_today")
+
+    @property
+    def native_unit_of_measurement(self):
+        return self.coordinator.cost.currency
+
+    @property
+    def last_reset(self):
+        return self.coordinator.cost.day_start
+
+    @property
+    def native_value(self):
+        return round(self.coordinator.cost.today_cost, 2)
@@ -0,0 +1,44 @@
+"""Opstarttijden van de integratie meten."""
+
+import logging
+import time
+from contextlib import contextmanager
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Meet de opstartfases van één config entry setup.
+
+    ``span`` meet de duur van een stap (import, bind, ...), ``mark`` de tijd
+    sinds het begin van de setup (bv. wanneer de eerste THOR klaar is).
+    """
+
+    def __init__(self):
+        self._start = time.monotonic()
+        self.spans = {}
+        self.marks = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.spans[name] = time.monotonic() - start
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = time.monotonic() - self._start
+
+    def as_dict(self) -> dict:
+        return {
+            **{f"{name}_s": round(value, 3) for name, value in self.spans.items()},
+            **{f"{name}_at_s": round(value, 3) for name, value in self.marks.items()},
+        }
+
+    def log(self, title):
+        parts = [f"{name} {value:.3f}s" for name, value in self.spans.items()]
+        parts += [f"{name} at +{value:.3f}s" for name, value in self.marks.items()]
+        _LOGGER.info("Growatt THOR %s: %s", title, ", ".join(parts))